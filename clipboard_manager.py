@@ -3,6 +3,22 @@ import os
 from datetime import datetime
 import platform
 import subprocess
+import shutil
+import asyncio
+import sqlite3
+import hashlib
+import re
+import difflib
+import ctypes
+import ctypes.util
+import select
+import threading
+import time
+import struct
+import zlib
+import html
+import pathlib
+import urllib.parse
 
 if platform.system() == "Windows":
     import win32clipboard as clipboard
@@ -10,19 +26,398 @@ if platform.system() == "Windows":
 
 documents_dir = os.path.join(os.path.expanduser("~"), "Documents")
 HISTORY_FILE = os.path.join(documents_dir, "clipboard_history.json")
-MAX_HISTORY_ITEMS = 100  
+HISTORY_DB = os.path.join(documents_dir, "clipboard_history.db")
+BLOB_DIR = os.path.join(documents_dir, "clipboard_blobs")
+MAX_HISTORY_ITEMS = 50000
+# History may run this far over MAX_HISTORY_ITEMS before the oldest rows are trimmed in one go
+HISTORY_TRIM_SLACK = 500
+# Text longer than this goes to blob storage, with a preview kept in the index
+INLINE_TEXT_LIMIT = 64 * 1024
+TEXT_PREVIEW_CHARS = 4096
+MAX_CAPTURE_BYTES = 64 * 1024 * 1024
+IMAGE_TARGETS = ["image/png", "image/jpeg", "image/bmp"]
+FILE_TARGETS = ["x-special/gnome-copied-files", "text/uri-list"]
+ZSTD = None
+# Word index for ranked and prefix search, trigram index for substring and fuzzy search
+SEARCH_INDEXES = {
+    "items_fts": "unicode61 remove_diacritics 2",
+    "items_trigram": "trigram",
+}
+# Polling backs off from the minimum to the maximum interval while the clipboard is idle
+WATCH_MIN_INTERVAL = 0.25
+WATCH_MAX_INTERVAL = 5.0
+WATCHER = None
+WATCHER_LOCK = threading.Lock()
 
-if not os.path.exists(HISTORY_FILE):
-    try:
-        with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump([], f)
-    except Exception:
-        pass
+XFIXES_SET_SELECTION_OWNER_NOTIFY_MASK = 1
+XFIXES_SELECTION_NOTIFY = 0
+
+# Detected once per process; see clipboard_backend
+BACKEND = None
+BACKEND_LOCK = threading.Lock()
+# Change marker of the clipboard as last recorded; see capture_if_changed
+LAST_CAPTURE_TOKEN = None
+X11 = None
+X11_LOCK = threading.Lock()
+X11_TIMEOUT = 0.5
+X11_PROPERTY_NOTIFY = 28
+X11_SELECTION_CLEAR = 29
+X11_SELECTION_REQUEST = 30
+X11_SELECTION_NOTIFY = 31
+X11_PROPERTY_CHANGE_MASK = 1 << 22
+X11_ANY_PROPERTY_TYPE = 0
+X11_XA_ATOM = 4
+X11_XA_INTEGER = 19
+X11_XA_STRING = 31
+X11_PROP_MODE_REPLACE = 0
+X11_PROP_MODE_APPEND = 2
+# Text targets served while this process owns CLIPBOARD
+X11_TEXT_TARGETS = ("UTF8_STRING", "TEXT", "text/plain;charset=utf-8", "STRING")
+
+# Fuzzy search re-scores this many trigram hits and keeps words at least this similar
+FUZZY_CANDIDATES = 500
+FUZZY_THRESHOLD = 0.75
 
 public_description = "Manage clipboard history and retrieve previously copied items."
 
+class XSelectionEvent(ctypes.Structure):
+    _fields_ = [("type", ctypes.c_int), ("serial", ctypes.c_ulong), ("send_event", ctypes.c_int),
+                ("display", ctypes.c_void_p), ("requestor", ctypes.c_ulong), ("selection", ctypes.c_ulong),
+                ("target", ctypes.c_ulong), ("property", ctypes.c_ulong), ("time", ctypes.c_ulong)]
+
+class XSelectionRequestEvent(ctypes.Structure):
+    _fields_ = [("type", ctypes.c_int), ("serial", ctypes.c_ulong), ("send_event", ctypes.c_int),
+                ("display", ctypes.c_void_p), ("owner", ctypes.c_ulong), ("requestor", ctypes.c_ulong),
+                ("selection", ctypes.c_ulong), ("target", ctypes.c_ulong), ("property", ctypes.c_ulong),
+                ("time", ctypes.c_ulong)]
+
+class XPropertyEvent(ctypes.Structure):
+    _fields_ = [("type", ctypes.c_int), ("serial", ctypes.c_ulong), ("send_event", ctypes.c_int),
+                ("display", ctypes.c_void_p), ("window", ctypes.c_ulong), ("atom", ctypes.c_ulong),
+                ("time", ctypes.c_ulong), ("state", ctypes.c_int)]
+
+class XEvent(ctypes.Union):
+    # Padded to 24 longs like Xlib's union
+    _fields_ = [("type", ctypes.c_int), ("xselection", XSelectionEvent),
+                ("xselectionrequest", XSelectionRequestEvent), ("xproperty", XPropertyEvent),
+                ("pad", ctypes.c_long * 24)]
+
+# Kept alive for as long as Xlib may call it
+X11_ERROR_HANDLER = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p)(lambda display, error: 0)
+
+def load_x11():
+    """libX11 through ctypes with the signatures used here, or None without it or without a display."""
+    global X11
+    with X11_LOCK:
+        if X11 is not None:
+            return X11 or None
+        X11 = False
+        if platform.system() != "Linux" or not os.environ.get("DISPLAY"):
+            return None
+        name = ctypes.util.find_library("X11")
+        if not name:
+            return None
+        try:
+            x11 = ctypes.CDLL(name)
+        except OSError:
+            return None
+        display, window, atom = ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong
+        signatures = {
+            "XInitThreads": (ctypes.c_int, []),
+            "XSetErrorHandler": (ctypes.c_void_p, [ctypes.c_void_p]),
+            "XOpenDisplay": (display, [ctypes.c_char_p]),
+            "XCloseDisplay": (ctypes.c_int, [display]),
+            "XDefaultRootWindow": (window, [display]),
+            "XCreateSimpleWindow": (window, [display, window, ctypes.c_int, ctypes.c_int, ctypes.c_uint,
+                                             ctypes.c_uint, ctypes.c_uint, ctypes.c_ulong, ctypes.c_ulong]),
+            "XSelectInput": (ctypes.c_int, [display, window, ctypes.c_long]),
+            "XInternAtom": (atom, [display, ctypes.c_char_p, ctypes.c_int]),
+            "XGetAtomName": (ctypes.c_void_p, [display, atom]),
+            "XMaxRequestSize": (ctypes.c_long, [display]),
+            "XConnectionNumber": (ctypes.c_int, [display]),
+            "XPending": (ctypes.c_int, [display]),
+            "XNextEvent": (ctypes.c_int, [display, ctypes.POINTER(XEvent)]),
+            "XFlush": (ctypes.c_int, [display]),
+            "XConvertSelection": (ctypes.c_int, [display, atom, atom, atom, window, ctypes.c_ulong]),
+            "XSetSelectionOwner": (ctypes.c_int, [display, atom, window, ctypes.c_ulong]),
+            "XGetSelectionOwner": (window, [display, atom]),
+            "XGetWindowProperty": (ctypes.c_int, [display, window, atom, ctypes.c_long, ctypes.c_long, ctypes.c_int,
+                                                  atom, ctypes.POINTER(atom), ctypes.POINTER(ctypes.c_int),
+                                                  ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_ulong),
+                                                  ctypes.POINTER(ctypes.c_void_p)]),
+            "XChangeProperty": (ctypes.c_int, [display, window, atom, atom, ctypes.c_int, ctypes.c_int,
+                                               ctypes.c_void_p, ctypes.c_int]),
+            "XDeleteProperty": (ctypes.c_int, [display, window, atom]),
+            "XSendEvent": (ctypes.c_int, [display, window, ctypes.c_int, ctypes.c_long, ctypes.POINTER(XEvent)]),
+            "XFree": (ctypes.c_int, [ctypes.c_void_p]),
+        }
+        try:
+            for function_name, (restype, argtypes) in signatures.items():
+                getattr(x11, function_name).restype = restype
+                getattr(x11, function_name).argtypes = argtypes
+        except AttributeError:
+            return None
+        # Several threads talk to Xlib (reader, owner, watcher), and errors such as BadWindow from a
+        # requestor that went away must not reach Xlib's default handler, which exits the process
+        if not x11.XInitThreads():
+            return None
+        x11.XSetErrorHandler(ctypes.cast(X11_ERROR_HANDLER, ctypes.c_void_p))
+        X11 = x11
+        return x11
+
+def x11_connect(x11):
+    display = x11.XOpenDisplay(None)
+    if not display:
+        return None
+    window = x11.XCreateSimpleWindow(display, x11.XDefaultRootWindow(display), 0, 0, 1, 1, 0, 0, 0)
+    # PropertyNotify on our own window is how a server timestamp is obtained
+    x11.XSelectInput(display, window, X11_PROPERTY_CHANGE_MASK)
+    connection = {
+        "display": display,
+        "window": window,
+        "fd": x11.XConnectionNumber(display),
+        # Largest property one request can carry; bigger transfers need INCR, which the commands handle
+        "max_bytes": x11.XMaxRequestSize(display) * 4 - 1024,
+        "atoms": {},
+        "names": {},
+    }
+    return connection
+
+def x11_atom(x11, connection, name):
+    if name not in connection["atoms"]:
+        connection["atoms"][name] = x11.XInternAtom(connection["display"], name.encode(), 0)
+    return connection["atoms"][name]
+
+def x11_atom_name(x11, connection, atom):
+    if atom not in connection["names"]:
+        pointer = x11.XGetAtomName(connection["display"], atom)
+        if not pointer:
+            return None
+        try:
+            connection["names"][atom] = ctypes.string_at(pointer).decode('utf-8', errors='replace')
+        finally:
+            x11.XFree(pointer)
+    return connection["names"][atom]
+
+def x11_wait(x11, connection, wanted, deadline, other=None):
+    """First event for which wanted(event) is true, or None once deadline passes; other events go to other."""
+    event = XEvent()
+    while True:
+        while x11.XPending(connection["display"]):
+            x11.XNextEvent(connection["display"], ctypes.byref(event))
+            if wanted(event):
+                return event
+            if other is not None:
+                other(event)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        select.select([connection["fd"]], [], [], remaining)
+
+def x11_request(backend, target):
+    """Convert CLIPBOARD to target: (type name, bytes or list of ints), ("", b"") when refused, None to fall back.
+
+    INCR transfers and owners that do not answer within X11_TIMEOUT are left to xclip/xsel.
+    """
+    x11 = backend["x11"]
+    # Not backend["lock"]: this process's own owner thread takes that to answer
+    with backend["reader_lock"]:
+        connection = backend["reader"]
+        display = connection["display"]
+        clipboard_atom = x11_atom(x11, connection, "CLIPBOARD")
+        if not x11.XGetSelectionOwner(display, clipboard_atom):
+            return "", b""
+        target_atom = x11_atom(x11, connection, target)
+        prop = x11_atom(x11, connection, "SCRIPTY_CLIPBOARD")
+        # Replies to earlier requests that timed out must not be taken for this one
+        x11_wait(x11, connection, lambda event: False, 0)
+        x11.XConvertSelection(display, clipboard_atom, target_atom, prop, connection["window"], 0)
+        x11.XFlush(display)
+        event = x11_wait(x11, connection, lambda event: event.type == X11_SELECTION_NOTIFY
+                         and event.xselection.target == target_atom, time.monotonic() + X11_TIMEOUT)
+        if event is None:
+            return None
+        if not event.xselection.property:
+            return "", b""
+        
+        actual_type = ctypes.c_ulong()
+        actual_format = ctypes.c_int()
+        items = ctypes.c_ulong()
+        remaining = ctypes.c_ulong()
+        data = ctypes.c_void_p()
+        # Not deleted yet: for INCR, deleting the property is what starts the chunked transfer
+        status = x11.XGetWindowProperty(display, connection["window"], event.xselection.property, 0,
+                                        MAX_CAPTURE_BYTES // 4, 0, X11_ANY_PROPERTY_TYPE, ctypes.byref(actual_type),
+                                        ctypes.byref(actual_format), ctypes.byref(items), ctypes.byref(remaining),
+                                        ctypes.byref(data))
+        try:
+            if status != 0 or actual_type.value == x11_atom(x11, connection, "INCR") or remaining.value:
+                return None
+            if actual_format.value == 32:
+                # Xlib hands 32-bit items back as C longs
+                values = list((ctypes.c_ulong * items.value).from_address(data.value)) if data else []
+            else:
+                values = ctypes.string_at(data, items.value * actual_format.value // 8) if data else b""
+        finally:
+            if data:
+                x11.XFree(data)
+        x11.XDeleteProperty(display, connection["window"], event.xselection.property)
+        x11.XFlush(display)
+        return x11_atom_name(x11, connection, actual_type.value) or "", values
+
+def x11_get_text(backend):
+    """CLIPBOARD as text over the kept-open reader connection; None means use the command fallback."""
+    with backend["lock"]:
+        if backend["owned"] is not None:
+            return backend["owned"]
+    for target in ("UTF8_STRING", "STRING"):
+        reply = x11_request(backend, target)
+        if reply is None:
+            return None
+        kind, data = reply
+        if kind:
+            return data.decode('utf-8' if target == "UTF8_STRING" else 'latin-1', errors='replace').strip()
+    return ""
+
+def x11_server_time(x11, connection, other):
+    """Current X server time, read from the PropertyNotify that a zero-length append produces."""
+    prop = x11_atom(x11, connection, "SCRIPTY_CLIPBOARD")
+    x11.XChangeProperty(connection["display"], connection["window"], prop, X11_XA_STRING, 8, X11_PROP_MODE_APPEND,
+                        None, 0)
+    x11.XFlush(connection["display"])
+    event = x11_wait(x11, connection, lambda event: event.type == X11_PROPERTY_NOTIFY
+                     and event.xproperty.atom == prop, time.monotonic() + X11_TIMEOUT, other)
+    return event.xproperty.time if event is not None else 0
+
+def x11_serve(backend):
+    """Own CLIPBOARD for text set from here and answer other clients' requests until someone else copies.
+
+    X11 clipboards live in the owning process, so text set here stays pasteable while this process runs.
+    """
+    x11 = backend["x11"]
+    connection = backend["owner"]
+    display = connection["display"]
+    wake_read = backend["wake"][0]
+    
+    def handle(event):
+        if event.type == X11_SELECTION_CLEAR:
+            with backend["lock"]:
+                backend["owned"] = None
+        elif event.type == X11_SELECTION_REQUEST:
+            x11_answer(backend, connection, event.xselectionrequest)
+    
+    while True:
+        readable, _, _ = select.select([connection["fd"], wake_read], [], [])
+        if wake_read in readable:
+            os.read(wake_read, 4096)
+            clipboard_atom = x11_atom(x11, connection, "CLIPBOARD")
+            acquired_at = x11_server_time(x11, connection, handle)
+            x11.XSetSelectionOwner(display, clipboard_atom, connection["window"], acquired_at)
+            with backend["lock"]:
+                backend["acquired_at"] = acquired_at
+                backend["acquired_ok"] = x11.XGetSelectionOwner(display, clipboard_atom) == connection["window"]
+                if not backend["acquired_ok"]:
+                    backend["owned"] = None
+            backend["acquired"].set()
+        x11_wait(x11, connection, lambda event: False, 0, handle)
+
+def x11_answer(backend, connection, request):
+    x11 = backend["x11"]
+    display = connection["display"]
+    with backend["lock"]:
+        text, acquired_at = backend["owned"], backend["acquired_at"]
+    # Obsolete clients leave property as None and expect the target name to be used instead
+    prop = request.property or request.target
+    names = {x11_atom(x11, connection, name): name for name in ("TARGETS", "TIMESTAMP") + X11_TEXT_TARGETS}
+    target = names.get(request.target)
+    if text is None or target is None:
+        prop = 0
+    elif target == "TARGETS":
+        atoms = (ctypes.c_ulong * len(names))(*names)
+        x11.XChangeProperty(display, request.requestor, prop, X11_XA_ATOM, 32, X11_PROP_MODE_REPLACE, atoms,
+                            len(atoms))
+    elif target == "TIMESTAMP":
+        stamp = (ctypes.c_ulong * 1)(acquired_at)
+        x11.XChangeProperty(display, request.requestor, prop, X11_XA_INTEGER, 32, X11_PROP_MODE_REPLACE, stamp, 1)
+    else:
+        data = text.encode('latin-1', errors='replace') if target == "STRING" else text.encode('utf-8')
+        kind = X11_XA_STRING if target == "STRING" else x11_atom(x11, connection, "UTF8_STRING")
+        x11.XChangeProperty(display, request.requestor, prop, kind, 8, X11_PROP_MODE_REPLACE, data, len(data))
+    
+    reply = XEvent()
+    reply.xselection.type = X11_SELECTION_NOTIFY
+    reply.xselection.requestor = request.requestor
+    reply.xselection.selection = request.selection
+    reply.xselection.target = request.target
+    reply.xselection.property = prop
+    reply.xselection.time = request.time
+    x11.XSendEvent(display, request.requestor, 0, 0, ctypes.byref(reply))
+    x11.XFlush(display)
+
+def x11_set_text(backend, text):
+    """Own CLIPBOARD with text from a background thread; False leaves the job to xclip/xsel."""
+    with backend["lock"]:
+        if backend["thread"] is None:
+            backend["owner"] = x11_connect(backend["x11"])
+            if backend["owner"] is None:
+                return False
+            backend["thread"] = threading.Thread(target=x11_serve, args=(backend,), name="clipboard_manager-x11",
+                                                 daemon=True)
+            backend["thread"].start()
+        # Text that does not fit in one property would need INCR, which xclip and xsel implement
+        if len(text.encode('utf-8')) > backend["owner"]["max_bytes"]:
+            return False
+        backend["owned"] = text
+    backend["acquired"].clear()
+    os.write(backend["wake"][1], b"x")
+    return backend["acquired"].wait(X11_TIMEOUT * 2) and backend["acquired_ok"]
+
+def command_backend():
+    """Every clipboard command that exists, as (read command, write command) pairs in order of preference."""
+    if platform.system() == "Darwin":
+        return [(['pbpaste'], ['pbcopy'])]
+    commands = []
+    if shutil.which('xclip'):
+        commands.append((['xclip', '-selection', 'clipboard', '-o'], ['xclip', '-selection', 'clipboard']))
+    if shutil.which('xsel'):
+        commands.append((['xsel', '-b'], ['xsel', '-ib']))
+    return commands
+
+def clipboard_backend():
+    """Work out how to reach the clipboard once per process: win32, in-process X11, or commands.
+
+    The commands stay available behind X11 for what it leaves to them, such as INCR transfers.
+    """
+    global BACKEND
+    with BACKEND_LOCK:
+        if BACKEND is not None:
+            return BACKEND
+        backend = {"name": "none", "commands": []}
+        if platform.system() == "Windows":
+            backend["name"] = "win32"
+        else:
+            backend["commands"] = command_backend()
+            if backend["commands"]:
+                backend["name"] = backend["commands"][0][0][0]
+            x11 = load_x11()
+            reader = x11_connect(x11) if x11 else None
+            if reader is not None:
+                backend.update({"name": "x11", "x11": x11, "reader": reader, "owner": None, "owned": None,
+                                "acquired_at": 0, "acquired_ok": False, "thread": None, "lock": threading.Lock(),
+                                "reader_lock": threading.Lock(), "acquired": threading.Event(),
+                                "wake": os.pipe()})
+        BACKEND = backend
+        return backend
+
+def reset_clipboard_backend():
+    """Detect the backend again on next use, e.g. after installing xclip. A running X11 owner keeps serving."""
+    global BACKEND
+    with BACKEND_LOCK:
+        BACKEND = None
+
 def get_clipboard_text():
-    if platform.system() == "Windows":
+    backend = clipboard_backend()
+    if backend["name"] == "win32":
         clipboard.OpenClipboard()
         try:
             if clipboard.IsClipboardFormatAvailable(win32con.CF_TEXT):
@@ -32,112 +427,658 @@ def get_clipboard_text():
         finally:
             clipboard.CloseClipboard()
     
-    elif platform.system() == "Darwin": 
-        try:
-            return subprocess.check_output(
-                ['pbpaste'], universal_newlines=True, stderr=subprocess.DEVNULL
-            ).strip()
-        except subprocess.CalledProcessError:
-            return ""
+    if backend["name"] == "x11":
+        text = x11_get_text(backend)
+        if text is not None:
+            return text
     
-    elif platform.system() == "Linux":
+    for read_command, _ in backend["commands"]:
         try:
-            return subprocess.check_output(
-                ['xclip', '-selection', 'clipboard', '-o'], 
-                universal_newlines=True, stderr=subprocess.DEVNULL
-            ).strip()
-        except (subprocess.SubprocessError, FileNotFoundError):
-            try:
-                return subprocess.check_output(
-                    ['xsel', '-b'], 
-                    universal_newlines=True, stderr=subprocess.DEVNULL
-                ).strip()
-            except (subprocess.SubprocessError, FileNotFoundError):
-                return ""
+            return subprocess.check_output(read_command, universal_newlines=True, stderr=subprocess.DEVNULL).strip()
+        except (subprocess.SubprocessError, OSError):
+            continue
     
     return ""
 
 def set_clipboard_text(text):
-    if platform.system() == "Windows":
+    backend = clipboard_backend()
+    if backend["name"] == "win32":
         clipboard.OpenClipboard()
         try:
             clipboard.EmptyClipboard()
             clipboard.SetClipboardText(text, win32con.CF_UNICODETEXT)
         finally:
             clipboard.CloseClipboard()
+        return
+    
+    if backend["name"] == "x11" and x11_set_text(backend, text):
+        return
     
-    elif platform.system() == "Darwin": 
+    for _, write_command in backend["commands"]:
         try:
-            subprocess.run(['pbcopy'], input=text.encode('utf-8'), check=True)
-        except subprocess.SubprocessError:
+            subprocess.run(write_command, input=text.encode('utf-8'), check=True)
+            return
+        except (subprocess.SubprocessError, OSError):
+            continue
+
+def xclip_available(backend):
+    return any(read_command[0] == "xclip" for read_command, _ in backend["commands"])
+
+def clipboard_targets(backend):
+    if backend["name"] == "x11":
+        reply = x11_request(backend, "TARGETS")
+        if reply is not None:
+            kind, atoms = reply
+            if kind != "ATOM":
+                return []
+            with backend["reader_lock"]:
+                return [name for name in (x11_atom_name(backend["x11"], backend["reader"], atom) for atom in atoms)
+                        if name]
+    if xclip_available(backend):
+        try:
+            output = subprocess.check_output(['xclip', '-selection', 'clipboard', '-t', 'TARGETS', '-o'],
+                                             stderr=subprocess.DEVNULL)
+            return output.decode('utf-8', errors='replace').split()
+        except (subprocess.SubprocessError, OSError):
             pass
+    return []
+
+def clipboard_target(backend, target):
+    if backend["name"] == "x11":
+        reply = x11_request(backend, target)
+        if reply is not None:
+            return reply[1] if isinstance(reply[1], bytes) else b""
+    if xclip_available(backend):
+        try:
+            return subprocess.check_output(['xclip', '-selection', 'clipboard', '-t', target, '-o'],
+                                           stderr=subprocess.DEVNULL)
+        except (subprocess.SubprocessError, OSError):
+            pass
+    return b""
+
+def image_size(data):
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if data[:2] == b"BM" and len(data) >= 26:
+        width, height = struct.unpack("<ii", data[18:26])
+        return width, abs(height)
+    return None
+
+def image_content(data, mime):
+    size = image_size(data)
+    label = f"{size[0]}x{size[1]} " if size else ""
+    return {"kind": "image", "text": f"[image {label}{mime.split('/')[-1]}]", "data": data, "mime": mime}
+
+def html_to_text(markup):
+    markup = re.sub(r"(?is)<(script|style)\b.*?</\1>", " ", markup)
+    return " ".join(html.unescape(re.sub(r"<[^>]+>", " ", markup)).split())
+
+def parse_uri_list(data):
+    paths = []
+    for line in data.decode('utf-8', errors='replace').splitlines():
+        line = line.strip()
+        if line.startswith("file://"):
+            paths.append(urllib.parse.unquote(urllib.parse.urlparse(line).path))
+    return paths
+
+def dib_to_bmp(dib):
+    """Prefix a CF_DIB bitmap with the file header that makes it a .bmp."""
+    header_size, = struct.unpack_from("<I", dib, 0)
+    bit_count, compression = struct.unpack_from("<HI", dib, 14)
+    colors_used, = struct.unpack_from("<I", dib, 32)
+    masks = 12 if header_size == 40 and compression == 3 else 0
+    palette = colors_used or (1 << bit_count if bit_count <= 8 else 0)
+    offset = 14 + header_size + masks + palette * 4
+    return b"BM" + struct.pack("<IHHI", 14 + len(dib), 0, 0, offset) + dib
+
+def cf_html_fragment(data):
+    raw = data if isinstance(data, bytes) else data.encode('utf-8')
+    offsets = dict(re.findall(rb"(StartFragment|EndFragment):(\d+)", raw[:512]))
+    if b"StartFragment" in offsets and b"EndFragment" in offsets:
+        raw = raw[int(offsets[b"StartFragment"]):int(offsets[b"EndFragment"])]
+    return raw.decode('utf-8', errors='replace')
+
+def cf_html_wrap(markup):
+    template = "Version:0.9\r\nStartHTML:{:010d}\r\nEndHTML:{:010d}\r\nStartFragment:{:010d}\r\nEndFragment:{:010d}\r\n"
+    prefix = b"<html><body><!--StartFragment-->"
+    suffix = b"<!--EndFragment--></body></html>"
+    body = markup.encode('utf-8')
+    start_html = len(template.format(0, 0, 0, 0))
+    start_fragment = start_html + len(prefix)
+    end_fragment = start_fragment + len(body)
+    end_html = end_fragment + len(suffix)
+    return template.format(start_html, end_html, start_fragment, end_fragment).encode('ascii') + prefix + body + suffix
+
+def win32_get_content():
+    html_format = clipboard.RegisterClipboardFormat("HTML Format")
+    clipboard.OpenClipboard()
+    try:
+        if clipboard.IsClipboardFormatAvailable(win32con.CF_HDROP):
+            paths = list(clipboard.GetClipboardData(win32con.CF_HDROP))
+            return {"kind": "files", "text": "\n".join(paths), "data": None, "mime": "text/uri-list"}
+        if clipboard.IsClipboardFormatAvailable(win32con.CF_DIB):
+            return image_content(dib_to_bmp(clipboard.GetClipboardData(win32con.CF_DIB)), "image/bmp")
+        markup = None
+        if clipboard.IsClipboardFormatAvailable(html_format):
+            markup = cf_html_fragment(clipboard.GetClipboardData(html_format))
+    finally:
+        clipboard.CloseClipboard()
+    text = get_clipboard_text()
+    if markup:
+        return {"kind": "html", "text": text or html_to_text(markup), "data": markup.encode('utf-8'), "mime": "text/html"}
+    return {"kind": "text", "text": text, "data": None, "mime": None} if text else None
+
+def get_clipboard_content():
+    """The richest thing on the clipboard: a file list, an image, HTML, or plain text. None when empty."""
+    backend = clipboard_backend()
+    if backend["name"] == "win32":
+        return win32_get_content()
+    
+    if backend["name"] == "x11" or xclip_available(backend):
+        targets = set(clipboard_targets(backend))
+        for target in FILE_TARGETS:
+            if target in targets:
+                paths = parse_uri_list(clipboard_target(backend, target))
+                if paths:
+                    return {"kind": "files", "text": "\n".join(paths), "data": None, "mime": "text/uri-list"}
+        for target in IMAGE_TARGETS:
+            if target in targets:
+                data = clipboard_target(backend, target)
+                if data and len(data) <= MAX_CAPTURE_BYTES:
+                    return image_content(data, target)
+        if "text/html" in targets:
+            markup = clipboard_target(backend, "text/html")
+            if markup:
+                text = get_clipboard_text() or html_to_text(markup.decode('utf-8', errors='replace'))
+                return {"kind": "html", "text": text, "data": markup, "mime": "text/html"}
+    
+    text = get_clipboard_text()
+    return {"kind": "text", "text": text, "data": None, "mime": None} if text else None
+
+def xclip_payload(item, data):
+    """The target and bytes xclip should offer for a stored non-text item."""
+    if item["kind"] == "image":
+        return item["mime"], data
+    if item["kind"] == "html":
+        return "text/html", data
+    uris = "\n".join(pathlib.Path(path).as_uri() for path in item["text"].split("\n"))
+    return "text/uri-list", uris.encode('utf-8')
+
+def win32_set_content(item, data):
+    html_format = clipboard.RegisterClipboardFormat("HTML Format")
+    if item["kind"] == "image" and item["mime"] != "image/bmp":
+        return False
+    clipboard.OpenClipboard()
+    try:
+        clipboard.EmptyClipboard()
+        if item["kind"] == "image":
+            clipboard.SetClipboardData(win32con.CF_DIB, data[14:])
+            return True
+        if item["kind"] == "html":
+            clipboard.SetClipboardData(html_format, cf_html_wrap(data.decode('utf-8', errors='replace')))
+        elif item["kind"] == "files":
+            # DROPFILES header (offset to the list, no point, wide chars) then NUL-separated paths
+            paths = "".join(path + "\0" for path in item["text"].split("\n")) + "\0"
+            clipboard.SetClipboardData(win32con.CF_HDROP, struct.pack("<IiiII", 20, 0, 0, 0, 1) + paths.encode('utf-16-le'))
+        clipboard.SetClipboardText(item["text"], win32con.CF_UNICODETEXT)
+        return True
+    finally:
+        clipboard.CloseClipboard()
+
+def set_clipboard_content(item, data=None):
+    """Put a stored item back on the clipboard; returns False when only its text could be restored."""
+    if item["kind"] == "text":
+        set_clipboard_text(data.decode('utf-8') if data else item["text"])
+        return True
     
-    elif platform.system() == "Linux":
+    backend = clipboard_backend()
+    if backend["name"] == "win32":
+        if win32_set_content(item, data):
+            return True
+    elif item["kind"] == "files" or data:
+        # xclip stays the selection owner and uses INCR for payloads larger than one property
+        if xclip_available(backend):
+            target, payload = xclip_payload(item, data)
+            try:
+                subprocess.run(['xclip', '-selection', 'clipboard', '-t', target], input=payload, check=True)
+                return True
+            except (subprocess.SubprocessError, OSError):
+                pass
+    
+    if item["kind"] != "image":
+        set_clipboard_text(item["text"])
+    return False
+
+def get_zstd():
+    """The zstandard module when installed; zlib is used otherwise."""
+    global ZSTD
+    if ZSTD is None:
         try:
-            subprocess.run(['xclip', '-selection', 'clipboard'], input=text.encode('utf-8'), check=True)
-        except (subprocess.SubprocessError, FileNotFoundError):
+            import zstandard
+            ZSTD = zstandard
+        except ImportError:
+            ZSTD = False
+    return ZSTD or None
+
+def blob_path(digest, extension):
+    return os.path.join(BLOB_DIR, digest[:2], digest + extension)
+
+def store_blob(data):
+    """Write data once under its hash, compressed when that helps; returns the hash."""
+    digest = hashlib.blake2b(data, digest_size=20).hexdigest()
+    if any(os.path.exists(blob_path(digest, extension)) for extension in (".zst", ".z", ".raw")):
+        return digest
+    
+    zstd = get_zstd()
+    if zstd is not None:
+        packed, extension = zstd.ZstdCompressor(level=6).compress(data), ".zst"
+    else:
+        packed, extension = zlib.compress(data, 6), ".z"
+    # Images and archives are usually compressed already
+    if len(packed) >= len(data):
+        packed, extension = data, ".raw"
+    
+    path = blob_path(digest, extension)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(packed)
+    os.replace(temp_path, path)
+    return digest
+
+def load_blob(digest):
+    for extension in (".raw", ".z", ".zst"):
+        path = blob_path(digest, extension)
+        if not os.path.exists(path):
+            continue
+        with open(path, 'rb') as f:
+            packed = f.read()
+        if extension == ".z":
+            return zlib.decompress(packed)
+        if extension == ".zst":
+            zstd = get_zstd()
+            if zstd is None:
+                raise RuntimeError("zstandard is needed to read this clipboard item")
+            return zstd.ZstdDecompressor().decompress(packed)
+        return packed
+    return None
+
+def release_blobs(conn, digests):
+    """Delete blobs that no history item refers to any more."""
+    for digest in digests:
+        if conn.execute("SELECT 1 FROM items WHERE blob = ? LIMIT 1", (digest,)).fetchone():
+            continue
+        for extension in (".zst", ".z", ".raw"):
             try:
-                subprocess.run(['xsel', '-ib'], input=text.encode('utf-8'), check=True)
-            except (subprocess.SubprocessError, FileNotFoundError):
+                os.remove(blob_path(digest, extension))
+            except FileNotFoundError:
                 pass
 
-def load_history():
+def text_hash(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+def open_history():
+    os.makedirs(documents_dir, exist_ok=True)
+    conn = sqlite3.connect(HISTORY_DB)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            hash TEXT NOT NULL UNIQUE,
+            text TEXT NOT NULL,
+            timestamp TEXT NOT NULL
+        );
+    """)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(items)")}
+    for column, definition in (("kind", "TEXT NOT NULL DEFAULT 'text'"), ("mime", "TEXT"), ("size", "INTEGER"),
+                               ("blob", "TEXT")):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE items ADD COLUMN {column} {definition}")
+    conn.execute("CREATE INDEX IF NOT EXISTS items_blob ON items(blob) WHERE blob IS NOT NULL")
+    # Row count kept by triggers, so adding an item never has to count or walk the table
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'item_count'").fetchone():
+        conn.executescript("""
+            CREATE TABLE item_count (n INTEGER NOT NULL);
+            INSERT INTO item_count SELECT COUNT(*) FROM items;
+            CREATE TRIGGER item_count_insert AFTER INSERT ON items BEGIN
+                UPDATE item_count SET n = n + 1;
+            END;
+            CREATE TRIGGER item_count_delete AFTER DELETE ON items BEGIN
+                UPDATE item_count SET n = n - 1;
+            END;
+        """)
+    conn.commit()
+    ensure_search_index(conn)
     if os.path.exists(HISTORY_FILE):
-        try:
-            with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, UnicodeDecodeError):
-            return []
-    return []
+        migrate_json_history(conn)
+    return conn
 
-def save_history(history):
-    if not os.path.exists(documents_dir):
+def ensure_search_index(conn):
+    """Create the FTS5 indexes this SQLite build supports, kept in sync with items by triggers."""
+    existing = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for name, tokenizer in SEARCH_INDEXES.items():
+        if name in existing:
+            continue
         try:
-            os.makedirs(documents_dir)
-        except Exception:
-            pass
-    
+            conn.execute(f"CREATE VIRTUAL TABLE {name} USING fts5(text, content='items', content_rowid='id', "
+                         f"tokenize='{tokenizer}')")
+        except sqlite3.OperationalError:
+            continue
+        conn.executescript(f"""
+            CREATE TRIGGER IF NOT EXISTS {name}_insert AFTER INSERT ON items BEGIN
+                INSERT INTO {name} (rowid, text) VALUES (new.id, new.text);
+            END;
+            CREATE TRIGGER IF NOT EXISTS {name}_delete AFTER DELETE ON items BEGIN
+                INSERT INTO {name} ({name}, rowid, text) VALUES ('delete', old.id, old.text);
+            END;
+            INSERT INTO {name} ({name}) VALUES ('rebuild');
+        """)
+        conn.commit()
+
+def search_indexes(conn):
+    return {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+            if name in SEARCH_INDEXES}
+
+def quote_term(term):
+    return '"' + term.replace('"', '""') + '"'
+
+def migrate_json_history(conn):
+    """Import the old clipboard_history.json once, then move it aside."""
     try:
-        with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(history, f, ensure_ascii=False, indent=2)
-    except Exception:
+        with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
+            history = json.load(f)
+    except (OSError, json.JSONDecodeError, UnicodeDecodeError):
+        history = []
+    # The JSON list is newest first; ids grow with recency
+    with conn:
+        for item in reversed(history):
+            if item.get("text"):
+                conn.execute("INSERT OR IGNORE INTO items (hash, text, timestamp) VALUES (?, ?, ?)",
+                             (text_hash(item["text"]), item["text"], item.get("timestamp", "")))
+    try:
+        os.replace(HISTORY_FILE, HISTORY_FILE + ".migrated")
+    except OSError:
         pass
 
-def add_to_history(text):
-    if not text or text.isspace():
-        return
-        
-    history = load_history()
-    
-    history = [item for item in history if item["text"] != text]
+ITEM_COLUMNS = "items.text, items.timestamp, items.kind, items.mime, items.size, items.blob"
+
+def row_item(row):
+    text, timestamp, kind, mime, size, blob = row
+    return {"text": text, "timestamp": timestamp, "kind": kind, "mime": mime, "size": size, "blob": blob}
+
+def load_history(conn, limit=10, offset=0):
+    """Newest items first; index 0 is the most recent copy."""
+    rows = conn.execute(f"SELECT {ITEM_COLUMNS} FROM items ORDER BY id DESC LIMIT ? OFFSET ?", (limit, offset))
+    return [row_item(row) for row in rows]
+
+def history_count(conn):
+    return conn.execute("SELECT n FROM item_count").fetchone()[0]
+
+def add_to_history(conn, text):
+    add_content(conn, {"kind": "text", "text": text, "data": None, "mime": None})
+
+def add_content(conn, content):
+    """Record clipboard content; large payloads go to blob storage and the row keeps a preview."""
+    kind = content["kind"]
+    text = content.get("text") or ""
+    data = content.get("data")
+    if kind == "text":
+        if not text or text.isspace():
+            return
+        digest = text_hash(text)
+        encoded = text.encode('utf-8')
+        size = len(encoded)
+        if size > INLINE_TEXT_LIMIT:
+            data, text = encoded, text[:TEXT_PREVIEW_CHARS]
+    else:
+        if not data and kind != "files":
+            return
+        digest = hashlib.blake2b(kind.encode() + b"\0" + (data or text.encode('utf-8')), digest_size=16).hexdigest()
+        size = len(data) if data else len(text.encode('utf-8'))
+        text = text[:TEXT_PREVIEW_CHARS]
     
-    history.insert(0, {
-        "text": text,
-        "timestamp": datetime.now().isoformat(),
-    })
+    newest = conn.execute("SELECT hash FROM items ORDER BY id DESC LIMIT 1").fetchone()
+    if newest and newest[0] == digest:
+        return
     
-    if len(history) > MAX_HISTORY_ITEMS:
-        history = history[:MAX_HISTORY_ITEMS]
-        
-    save_history(history)
+    blob = store_blob(data) if data else None
+    # Re-copying an older item moves it to the front: drop the old row, append a new one
+    with conn:
+        released = {row[0] for row in conn.execute("SELECT blob FROM items WHERE hash = ? AND blob IS NOT NULL",
+                                                   (digest,))}
+        conn.execute("DELETE FROM items WHERE hash = ?", (digest,))
+        conn.execute("INSERT INTO items (hash, text, timestamp, kind, mime, size, blob) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     (digest, text, datetime.now().isoformat(), kind, content.get("mime"), size, blob))
+        excess = history_count(conn) - MAX_HISTORY_ITEMS
+        if excess > HISTORY_TRIM_SLACK:
+            # Oldest rows come first in id order, so this only reads the rows it removes
+            cutoff = conn.execute("SELECT id FROM items ORDER BY id LIMIT 1 OFFSET ?", (excess - 1,)).fetchone()
+            released.update(row[0] for row in conn.execute(
+                "SELECT blob FROM items WHERE id <= ? AND blob IS NOT NULL", cutoff))
+            conn.execute("DELETE FROM items WHERE id <= ?", cutoff)
+    release_blobs(conn, released)
+
+def run_search(conn, index, match, limit, offset):
+    total = conn.execute(f"SELECT COUNT(*) FROM {index} WHERE {index} MATCH ?", (match,)).fetchone()[0]
+    if not total:
+        return [], 0
+    rows = conn.execute(f"""
+        SELECT {ITEM_COLUMNS} FROM {index} JOIN items ON items.id = {index}.rowid
+        WHERE {index} MATCH ? ORDER BY {index}.rank, items.id DESC LIMIT ? OFFSET ?
+    """, (match, limit, offset))
+    return [row_item(row) for row in rows], total
+
+def fuzzy_match(terms, text):
+    """True when every query term is close to some word of text, e.g. a typo or a missing letter."""
+    words = set(re.findall(r"\w+", text.lower()))
+    for term in terms:
+        matcher = difflib.SequenceMatcher(b=term)
+        for word in words:
+            matcher.set_seq1(word)
+            if matcher.real_quick_ratio() >= FUZZY_THRESHOLD and matcher.quick_ratio() >= FUZZY_THRESHOLD \
+                    and matcher.ratio() >= FUZZY_THRESHOLD:
+                break
+        else:
+            return False
+    return True
+
+def search_history(conn, query, limit=10, offset=0):
+    """Ranked search, trying word prefixes, then the literal substring, then shared trigrams.
 
-def search_history(query):
-    history = load_history()
+    Returns (items, total matches, how they matched).
+    """
     if not query:
-        return history[:10]  
+        return load_history(conn, limit, offset), history_count(conn), "recent"
     
-    matches = []
-    for item in history:
-        if query.lower() in item["text"].lower():
-            matches.append(item)
+    indexes = search_indexes(conn)
+    terms = re.findall(r"\w+", query.lower())
+    if "items_fts" in indexes and terms:
+        items, total = run_search(conn, "items_fts", " ".join(quote_term(t) + "*" for t in terms), limit, offset)
+        if total:
+            return items, total, "words"
     
-    return matches
+    if "items_trigram" in indexes and len(query) >= 3:
+        items, total = run_search(conn, "items_trigram", quote_term(query), limit, offset)
+        if total:
+            return items, total, "substring"
+        trigrams = {term[i:i + 3] for term in terms for i in range(len(term) - 2)}
+        if trigrams:
+            candidates, _ = run_search(conn, "items_trigram", " OR ".join(quote_term(t) for t in sorted(trigrams)),
+                                       FUZZY_CANDIDATES, 0)
+            matches = [item for item in candidates if fuzzy_match(terms, item["text"])]
+            return matches[offset:offset + limit], len(matches), "fuzzy"
+        return [], 0, "substring"
+    
+    pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    total = conn.execute("SELECT COUNT(*) FROM items WHERE text LIKE ? ESCAPE '\\'", (pattern,)).fetchone()[0]
+    rows = conn.execute(f"SELECT {ITEM_COLUMNS} FROM items WHERE text LIKE ? ESCAPE '\\' ORDER BY id DESC LIMIT ? OFFSET ?",
+                        (pattern, limit, offset))
+    return [row_item(row) for row in rows], total, "substring"
+
+def load_xfixes():
+    """libX11 and libXfixes through ctypes, or None without them or without a display."""
+    x11 = load_x11()
+    xfixes_name = ctypes.util.find_library("Xfixes")
+    if x11 is None or not xfixes_name:
+        return None
+    try:
+        xfixes = ctypes.CDLL(xfixes_name)
+    except OSError:
+        return None
+    xfixes.XFixesQueryExtension.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int)]
+    xfixes.XFixesSelectSelectionInput.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_ulong]
+    return x11, xfixes
+
+def x11_change_token(backend):
+    """CLIPBOARD's owner window and TIMESTAMP, read in process without fetching the payload."""
+    x11 = backend["x11"]
+    with backend["reader_lock"]:
+        owner = x11.XGetSelectionOwner(backend["reader"]["display"], x11_atom(x11, backend["reader"], "CLIPBOARD"))
+    if not owner:
+        return 0, None
+    reply = x11_request(backend, "TIMESTAMP")
+    if reply is not None and isinstance(reply[1], list) and reply[1]:
+        return owner, reply[1][0]
+    # Owners that do not answer TIMESTAMP are compared by text, still read over the X11 connection
+    return owner, x11_get_text(backend)
+
+def clipboard_change_token():
+    """Something that changes whenever the clipboard does, as cheaply as the platform allows."""
+    if platform.system() == "Windows":
+        return clipboard.GetClipboardSequenceNumber()
+    backend = clipboard_backend()
+    if backend["name"] == "x11":
+        return x11_change_token(backend)
+    return get_clipboard_text()
+
+def capture_if_changed(conn):
+    """Record the clipboard unless its change marker shows it is what was last recorded.
+
+    The marker is the Windows sequence number or the X11 owner and TIMESTAMP. The command fallback has no
+    cheap marker, so there the clipboard is read every time.
+    """
+    global LAST_CAPTURE_TOKEN
+    token = clipboard_change_token() if clipboard_backend()["name"] in ("win32", "x11") else None
+    if token is not None and token == LAST_CAPTURE_TOKEN:
+        return
+    content = get_clipboard_content()
+    if content:
+        add_content(conn, content)
+    LAST_CAPTURE_TOKEN = token
+
+def capture_clipboard(watcher, conn, text=None):
+    if text is None:
+        content = get_clipboard_content()
+    else:
+        content = {"kind": "text", "text": text, "data": None, "mime": None}
+    if content and (content["kind"] != "text" or not content["text"].isspace()):
+        add_content(conn, content)
+        watcher["captured"] += 1
+        watcher["last_capture"] = datetime.now().isoformat()
+
+def run_xfixes(watcher, conn, libraries):
+    """Block on XFixes selection-owner notifications; returns False when XFixes is unusable."""
+    x11, xfixes = libraries
+    display = x11.XOpenDisplay(None)
+    if not display:
+        return False
+    try:
+        event_base = ctypes.c_int()
+        error_base = ctypes.c_int()
+        if not xfixes.XFixesQueryExtension(display, ctypes.byref(event_base), ctypes.byref(error_base)):
+            return False
+        selection = x11.XInternAtom(display, b"CLIPBOARD", 0)
+        xfixes.XFixesSelectSelectionInput(display, x11.XDefaultRootWindow(display), selection,
+                                          XFIXES_SET_SELECTION_OWNER_NOTIFY_MASK)
+        x11.XFlush(display)
+        fd = x11.XConnectionNumber(display)
+        event = XEvent()
+        watcher["backend"] = "xfixes"
+        while not watcher["stop"].is_set():
+            changed = False
+            while x11.XPending(display):
+                x11.XNextEvent(display, ctypes.byref(event))
+                if event.type == event_base.value + XFIXES_SELECTION_NOTIFY:
+                    changed = True
+            if changed:
+                capture_clipboard(watcher, conn)
+            select.select([fd], [], [], WATCH_MAX_INTERVAL)
+        return True
+    finally:
+        x11.XCloseDisplay(display)
+
+def run_polling(watcher, conn):
+    global LAST_CAPTURE_TOKEN
+    watcher["backend"] = "polling"
+    interval = WATCH_MIN_INTERVAL
+    last = clipboard_change_token()
+    while not watcher["stop"].wait(interval):
+        token = clipboard_change_token()
+        if token == last:
+            interval = min(interval * 2, WATCH_MAX_INTERVAL)
+            continue
+        last = token
+        interval = WATCH_MIN_INTERVAL
+        capture_clipboard(watcher, conn, token if isinstance(token, str) else None)
+        if not isinstance(token, str):
+            LAST_CAPTURE_TOKEN = token
+
+def run_watcher(watcher):
+    conn = open_history()
+    try:
+        libraries = load_xfixes()
+        if libraries is None or not run_xfixes(watcher, conn, libraries):
+            run_polling(watcher, conn)
+    except Exception as e:
+        watcher["error"] = str(e)
+    finally:
+        conn.close()
+
+def start_watcher():
+    global WATCHER
+    with WATCHER_LOCK:
+        if WATCHER is not None and WATCHER["thread"].is_alive():
+            return WATCHER, False
+        watcher = {
+            "backend": None,
+            "started": datetime.now().isoformat(),
+            "captured": 0,
+            "last_capture": None,
+            "error": None,
+            "stop": threading.Event()
+        }
+        watcher["thread"] = threading.Thread(target=run_watcher, args=(watcher,), name="clipboard_manager-watch",
+                                             daemon=True)
+        watcher["thread"].start()
+        WATCHER = watcher
+    return watcher, True
+
+def stop_watcher():
+    global WATCHER
+    with WATCHER_LOCK:
+        watcher, WATCHER = WATCHER, None
+    if watcher is None:
+        return False
+    watcher["stop"].set()
+    watcher["thread"].join(timeout=WATCH_MAX_INTERVAL + 1)
+    return True
+
+def watcher_status(watcher):
+    return {
+        "running": watcher["thread"].is_alive(),
+        "backend": watcher["backend"],
+        "started": watcher["started"],
+        "captured": watcher["captured"],
+        "last_capture": watcher["last_capture"],
+        "error": watcher["error"]
+    }
 
 async def function(args):
+    conn = None
     try:
-        current_clipboard = get_clipboard_text()
-        if current_clipboard:
-            add_to_history(current_clipboard)
+        conn = open_history()
+        capture_if_changed(conn)
         
         operation = args.get("operation", "show")
         
@@ -146,14 +1087,13 @@ async def function(args):
             
         elif operation == "show":
             limit = int(args.get("limit", 10))
-            history = load_history()
+            recent_items = load_history(conn, limit)
             
-            if not history:
+            if not recent_items:
                 return json.dumps({
                     "message": "No clipboard history found."
                 })
                 
-            recent_items = history[:limit]
             formatted_items = []
             
             for i, item in enumerate(recent_items):
@@ -172,6 +1112,8 @@ async def function(args):
                     "text": text,
                     "time": time_str
                 })
+                if item["kind"] != "text":
+                    formatted_items[-1]["type"] = item["kind"]
             
             return json.dumps({
                 "message": {
@@ -187,7 +1129,9 @@ async def function(args):
                     "message": "Please provide a search query"
                 })
                 
-            matches = search_history(query)
+            limit = int(args.get("limit", 10))
+            offset = int(args.get("offset", 0))
+            matches, total, match_type = search_history(conn, query, limit, offset)
             
             if not matches:
                 return json.dumps({
@@ -207,45 +1151,87 @@ async def function(args):
                     text = text[:97] + "..."
                 
                 formatted_matches.append({
-                    "index": i,
+                    "index": offset + i,
                     "text": text,
                     "time": time_str
                 })
+                if item["kind"] != "text":
+                    formatted_matches[-1]["type"] = item["kind"]
             
+            result = {
+                "text": f"Found {total} matches for '{query}', showing {offset + 1}-{offset + len(formatted_matches)}",
+                "match": match_type,
+                "total": total,
+                "items": formatted_matches
+            }
+            if offset + len(formatted_matches) < total:
+                result["next_offset"] = offset + len(formatted_matches)
             return json.dumps({
-                "message": {
-                    "text": f"Found {len(formatted_matches)} matches for '{query}'",
-                    "items": formatted_matches
-                }
+                "message": result
             })
             
         elif operation == "restore":
             index = int(args.get("index", 0))
-            history = load_history()
+            total = history_count(conn)
             
-            if not history:
+            if not total:
                 return json.dumps({
                     "message": "No clipboard history available"
                 })
                 
-            if index < 0 or index >= len(history):
+            if index < 0 or index >= total:
                 return json.dumps({
-                    "message": f"Invalid index: {index}. Valid range is 0 to {len(history)-1}"
+                    "message": f"Invalid index: {index}. Valid range is 0 to {total-1}"
                 })
                 
-            item = history[index]
-            set_clipboard_text(item["text"])
+            item = load_history(conn, 1, index)[0]
+            data = load_blob(item["blob"]) if item["blob"] else None
+            if item["blob"] and data is None:
+                return json.dumps({
+                    "message": "The stored content for this item is missing"
+                })
+            restored = set_clipboard_content(item, data)
             
+            result = {
+                "text": "Restored clipboard item" if restored
+                        else "Images cannot be restored with the available clipboard tools" if item["kind"] == "image"
+                        else f"Could only restore the text of this {item['kind']} item",
+                "content": item["text"][:100] + ("..." if len(item["text"]) > 100 else "")
+            }
+            if item["kind"] != "text":
+                result["type"] = item["kind"]
+            return json.dumps({
+                "message": result
+            })
+            
+        elif operation == "watch":
+            watcher, started = start_watcher()
+            # Give the thread a moment to settle on a backend before reporting it
+            for _ in range(20):
+                if watcher["backend"] or not watcher["thread"].is_alive():
+                    break
+                await asyncio.sleep(0.01)
+            return json.dumps({
+                "message": {
+                    "text": "Started watching the clipboard" if started else "Already watching the clipboard",
+                    **watcher_status(watcher)
+                }
+            })
+            
+        elif operation == "unwatch":
+            watcher = WATCHER
+            stopped = stop_watcher()
             return json.dumps({
                 "message": {
-                    "text": "Restored clipboard item",
-                    "content": item["text"][:100] + ("..." if len(item["text"]) > 100 else "")
+                    "text": "Stopped watching the clipboard" if stopped else "The clipboard was not being watched",
+                    **(watcher_status(watcher) if watcher else {})
                 }
             })
             
         elif operation == "clear":
-            if os.path.exists(HISTORY_FILE):
-                os.remove(HISTORY_FILE)
+            with conn:
+                conn.execute("DELETE FROM items")
+            shutil.rmtree(BLOB_DIR, ignore_errors=True)
             return json.dumps({
                 "message": "Clipboard history cleared"
             })
@@ -259,17 +1245,20 @@ async def function(args):
         return json.dumps({
             "message": str(e)
         })
+    finally:
+        if conn is not None:
+            conn.close()
 
 object = {
     "name": "clipboard_manager",
-    "description": "Manage clipboard history and retrieve previously copied items.",
+    "description": "Manage clipboard history and retrieve previously copied items, including text, HTML, images and copied files.",
     "parameters": {
         "type": "object",
         "properties": {
             "operation": {
                 "type": "string",
-                "enum": ["show", "search", "restore", "clear"],
-                "description": "Operation to perform with clipboard history"
+                "enum": ["show", "search", "restore", "clear", "watch", "unwatch"],
+                "description": "Operation to perform with clipboard history; watch keeps recording every copy in the background until unwatch"
             },
             "query": {
                 "type": "string",
@@ -281,7 +1270,11 @@ object = {
             },
             "limit": {
                 "type": "integer",
-                "description": "Maximum number of items to show (default: 10)"
+                "description": "Maximum number of items to show or search results per page (default: 10)"
+            },
+            "offset": {
+                "type": "integer",
+                "description": "Number of search results to skip, for fetching the next page"
             }
         },
         "required": ["operation"]
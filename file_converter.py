@@ -2,14 +2,103 @@ import os
 import subprocess
 import json
 import shutil
+import tempfile
 import platform
-import tkinter as tk
-from tkinter import filedialog
 import glob
+import asyncio
+import time
+import sqlite3
+import hashlib
+import re
+import uuid
+import collections
+import contextvars
+import datetime
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
 public_description = "Convert files between various formats (audio, video, images) using local tools."
 PLATFORM = platform.system().lower()
 
+# ImageMagick runs one image per core; ffmpeg already spreads a single job across cores
+IMAGE_WORKERS = os.cpu_count() or 1
+MEDIA_WORKERS = max(1, (os.cpu_count() or 1) // 4)
+MAX_CONCURRENT_JOBS = max(IMAGE_WORKERS, MEDIA_WORKERS)
+CONVERSION_TIMEOUT = 3600
+
+MANIFEST_DIR = os.path.join(os.path.expanduser("~"), ".scripty")
+MANIFEST_FILE = os.path.join(MANIFEST_DIR, "conversions.db")
+IN_FLIGHT = {}
+# Files prepared (stat, manifest lookup, hash) at once by plan_batch
+PREPARE_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+STDERR_TAIL_LINES = 20
+MAX_FINISHED_JOBS = 50
+JOBS = {}
+CURRENT_JOB = contextvars.ContextVar("file_converter_job", default=None)
+TOOL_PATHS = {}
+TOOL_VERSIONS = {}
+PROBE_CACHE = collections.OrderedDict()
+PROBE_CACHE_SIZE = 1024
+
+# Codecs each output container can hold without re-encoding; None means any codec.
+# Containers missing a stream type cannot hold that type at all.
+CONTAINER_CODECS = {
+    "mkv": {"video": None, "audio": None, "subtitle": None},
+    "mp4": {"video": {"h264", "hevc", "mpeg4", "av1", "vp9"}, "audio": {"aac", "mp3", "alac", "ac3", "eac3", "opus", "flac"},
+            "subtitle": {"mov_text"}},
+    "mov": {"video": {"h264", "hevc", "mpeg4", "prores", "mjpeg"}, "audio": {"aac", "alac", "mp3", "ac3", "pcm_s16le", "pcm_s24le"},
+            "subtitle": {"mov_text"}},
+    "webm": {"video": {"vp8", "vp9", "av1"}, "audio": {"vorbis", "opus"}, "subtitle": {"webvtt"}},
+    "avi": {"video": {"mpeg4", "h264", "mjpeg", "msmpeg4v3"}, "audio": {"mp3", "ac3", "pcm_s16le"}},
+    "m4a": {"audio": {"aac", "alac"}},
+    "aac": {"audio": {"aac"}},
+    "mp3": {"audio": {"mp3"}},
+    "ogg": {"audio": {"vorbis", "opus", "flac"}},
+    "flac": {"audio": {"flac"}},
+    "wav": {"audio": {"pcm_s16le", "pcm_s24le", "pcm_s32le", "pcm_f32le", "pcm_u8"}},
+}
+# Speed/quality trade-offs; no profile keeps plain ffmpeg and ImageMagick defaults
+PROFILES = {
+    "fast": {
+        "preset": "veryfast", "crf": 28, "vp9_speed": 8, "max_height": 720,
+        "audio_bitrate": "128k", "gif_fps": 10, "gif_width": 320, "gif_palette": False,
+        "image_max_size": 1920, "image_quality": 80
+    },
+    "balanced": {
+        "preset": "medium", "crf": 23, "vp9_speed": 4, "max_height": 1080,
+        "audio_bitrate": "192k", "gif_fps": 12, "gif_width": 480, "gif_palette": True,
+        "image_max_size": 4096, "image_quality": 90
+    },
+    "archive": {
+        "preset": "slow", "crf": 18, "vp9_speed": 1, "max_height": None,
+        "audio_bitrate": "320k", "gif_fps": 15, "gif_width": 640, "gif_palette": True,
+        "image_max_size": None, "image_quality": 95
+    },
+}
+DEFAULT_PROFILE = None
+
+BENCHMARK_DIR = os.path.join(MANIFEST_DIR, "benchmarks")
+BENCHMARK_FILES = 6
+# Files/sec drop against the previous run that is reported as a regression
+BENCHMARK_TOLERANCE = 0.10
+# Report fields that must match for two runs to be compared
+BENCHMARK_SETTINGS = ("platform", "cpu_count", "profile", "max_jobs", "pillow")
+# Fixture kind, source extension, target formats
+BENCHMARK_CASES = [
+    ("audio", "wav", ["mp3", "ogg", "flac"]),
+    ("video", "mkv", ["mp4", "webm", "gif"]),
+    ("image", "png", ["jpg", "webp"]),
+]
+VIDEO_ENCODERS = {"mp4": "libx264", "mov": "libx264", "mkv": "libx264", "webm": "libvpx-vp9", "avi": "mpeg4"}
+# Outputs that cannot be written from an input without a video stream
+VIDEO_ONLY_FORMATS = {"gif"}
+LOSSY_AUDIO_FORMATS = {"mp3", "aac", "m4a", "ogg", "mp4", "mov", "mkv", "webm", "avi"}
+
+STREAM_FLAGS = {"video": ("-c:v", "-vn"), "audio": ("-c:a", "-an"), "subtitle": ("-c:s", "-sn")}
+
+DURATION_PATTERN = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+
 def get_file_extension(file_path):
     return os.path.splitext(file_path)[1][1:].lower()
 
@@ -23,6 +112,31 @@ def get_latest_file(directory):
     except Exception:
         return None
 
+def find_tool(tool):
+    """shutil.which, remembered for the life of the process; see invalidate_tool_cache."""
+    if tool not in TOOL_PATHS:
+        TOOL_PATHS[tool] = shutil.which(tool)
+    return TOOL_PATHS[tool]
+
+def tool_version(tool):
+    if tool not in TOOL_VERSIONS:
+        version = None
+        path = find_tool(tool)
+        if path:
+            try:
+                output = subprocess.run([path, "-version"], stdin=subprocess.DEVNULL, capture_output=True,
+                                        text=True, timeout=10).stdout
+                version = output.splitlines()[0].strip() if output else None
+            except (OSError, subprocess.SubprocessError):
+                pass
+        TOOL_VERSIONS[tool] = version
+    return TOOL_VERSIONS[tool]
+
+def invalidate_tool_cache():
+    """Forget discovered tools, e.g. after installing ffmpeg or ImageMagick while the process is running."""
+    TOOL_PATHS.clear()
+    TOOL_VERSIONS.clear()
+
 def ensure_tools_installed():
     required_tools = {
         "ffmpeg": "FFmpeg for audio/video conversion",
@@ -32,10 +146,14 @@ def ensure_tools_installed():
     missing_tools = []
     
     for tool, description in required_tools.items():
-        if shutil.which(tool) is None:
+        if tool == "convert" and get_pillow() is not None:
+            continue
+        if find_tool(tool) is None:
             missing_tools.append(f"{tool} ({description})")
     
     if missing_tools:
+        # Probe again next time so a tool installed after this error is picked up
+        invalidate_tool_cache()
         return {
             "error": "Missing required tools",
             "missing": missing_tools,
@@ -48,41 +166,318 @@ def ensure_tools_installed():
     
     return {"success": True}
 
-def convert_media(input_file, output_file, format_params=None):
+async def run_command(cmd, output_files, timeout=None):
+    """Run cmd without blocking the event loop; returns (returncode, stderr) or raises TimeoutError."""
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
     try:
-        cmd = ["ffmpeg", "-i", input_file]
+        _, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        proc.kill()
+        await proc.wait()
+        for output_file in output_files:
+            if os.path.exists(output_file):
+                os.remove(output_file)
+        raise
+    return proc.returncode, stderr.decode('utf-8', errors='replace')
 
-        if format_params:
-            cmd.extend(format_params)
-            
-        cmd.append(output_file)
+def new_job():
+    finished = [job_id for job_id, job in JOBS.items() if job["status"] != "running"]
+    for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        del JOBS[job_id]
+    job = {
+        "id": uuid.uuid4().hex[:12],
+        "status": "running",
+        "started": time.time(),
+        "progress": {},
+        "files": {},
+        "result": None,
+        "task": None
+    }
+    JOBS[job["id"]] = job
+    return job
+
+def job_summary(job):
+    summary = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "elapsed": round(time.time() - job["started"], 3),
+        "progress": dict(job["progress"]),
+        "files": {path: dict(state) for path, state in job["files"].items()}
+    }
+    if job["result"] is not None:
+        summary["result"] = job["result"]
+    return summary
+
+def update_progress(state, fields, duration):
+    """Fold one ffmpeg -progress block into state, deriving percent and ETA when the duration is known."""
+    out_time = fields.get("out_time_us") or fields.get("out_time_ms")
+    position = int(out_time) / 1_000_000 if out_time and out_time.lstrip("-").isdigit() else None
+    speed = fields.get("speed", "").rstrip("x").strip()
+    speed = float(speed) if re.fullmatch(r"\d+(\.\d+)?", speed) else None
+    try:
+        state["fps"] = float(fields.get("fps", 0))
+    except ValueError:
+        pass
+    state["speed"] = speed
+    if position is not None:
+        state["position"] = round(position, 2)
+    if duration and position is not None:
+        state["percent"] = round(min(100.0, max(0.0, position / duration * 100)), 1)
+        state["eta"] = round((duration - position) / speed, 1) if speed else None
+    if fields.get("progress") == "end":
+        state["percent"] = 100.0
+        state["eta"] = 0
+
+async def run_ffmpeg(cmd, output_files, timeout=None, state=None):
+    """Run ffmpeg with -progress on stdout, keeping only the last STDERR_TAIL_LINES of its log."""
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    state = state if state is not None else {}
+    tail = collections.deque(maxlen=STDERR_TAIL_LINES)
+    duration = [state.get("duration")]
+    
+    async def read_progress():
+        fields = {}
+        async for raw in proc.stdout:
+            key, _, value = raw.decode('utf-8', errors='replace').strip().partition("=")
+            fields[key] = value
+            if key == "progress":
+                update_progress(state, fields, duration[0])
+                fields = {}
+    
+    async def read_log():
+        async for raw in proc.stderr:
+            line = raw.decode('utf-8', errors='replace').rstrip()
+            tail.append(line)
+            if duration[0] is None:
+                found = DURATION_PATTERN.search(line)
+                if found:
+                    hours, minutes, seconds = found.groups()
+                    duration[0] = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+                    state["duration"] = duration[0]
+    
+    tasks = [asyncio.ensure_future(read_progress()), asyncio.ensure_future(read_log()), asyncio.ensure_future(proc.wait())]
+    try:
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        if pending:
+            raise asyncio.TimeoutError()
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        proc.kill()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await proc.wait()
+        for output_file in output_files:
+            if os.path.exists(output_file):
+                os.remove(output_file)
+        raise
+    for task in tasks:
+        task.result()
+    return proc.returncode, "\n".join(tail)
+
+async def probe_media(input_file):
+    """ffprobe input_file once per (path, size, mtime); returns None when ffprobe is unavailable or fails."""
+    try:
+        stat = os.stat(input_file)
+    except OSError:
+        return None
+    key = (os.path.abspath(input_file), stat.st_size, stat.st_mtime_ns)
+    if key in PROBE_CACHE:
+        PROBE_CACHE.move_to_end(key)
+        return PROBE_CACHE[key]
+    if find_tool("ffprobe") is None:
+        return None
+    
+    proc = await asyncio.create_subprocess_exec(
+        "ffprobe", "-v", "error", "-print_format", "json", "-show_streams", "-show_format", input_file,
+        stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    stdout, _ = await proc.communicate()
+    if proc.returncode != 0:
+        return None
+    try:
+        probe = json.loads(stdout)
+    except json.JSONDecodeError:
+        return None
+    
+    PROBE_CACHE[key] = probe
+    if len(PROBE_CACHE) > PROBE_CACHE_SIZE:
+        PROBE_CACHE.popitem(last=False)
+    return probe
+
+def stream_copy_params(probe, output_format, max_height=None):
+    """ffmpeg codec options that copy every stream the output container can already hold.
+
+    Returns (params, copied stream types); streams that need a new codec are left to ffmpeg's default encoder.
+    """
+    supported = CONTAINER_CODECS.get(output_format)
+    if not probe or supported is None:
+        return None, []
+    codecs = {}
+    too_tall = False
+    for stream in probe.get("streams", []):
+        kind = stream.get("codec_type")
+        if kind in STREAM_FLAGS and not stream.get("disposition", {}).get("attached_pic"):
+            codecs.setdefault(kind, set()).add(stream.get("codec_name"))
+            if kind == "video" and max_height and (stream.get("height") or 0) > max_height:
+                too_tall = True
+    
+    params = []
+    copied = []
+    for kind, names in codecs.items():
+        codec_flag, drop_flag = STREAM_FLAGS[kind]
+        if kind not in supported:
+            params.append(drop_flag)
+        elif kind == "video" and too_tall:
+            continue
+        elif supported[kind] is None or names <= supported[kind]:
+            params.extend([codec_flag, "copy"])
+            copied.append(kind)
+    if "video" not in supported and "video" not in codecs:
+        params.append("-vn")  # cover art is reported as an attached picture, not a real video stream
+    return params or None, copied
+
+def profile_media_params(settings, output_format, copied):
+    """Encoder options for the streams that are not stream-copied under a named profile.
+
+    Thread count is left to ffmpeg, which already sizes each encoder to the machine.
+    """
+    params = []
+    if "video" not in copied and output_format in VIDEO_ENCODERS:
+        encoder = VIDEO_ENCODERS[output_format]
+        params.extend(["-c:v", encoder])
+        if encoder == "libx264":
+            params.extend(["-preset", settings["preset"], "-crf", str(settings["crf"])])
+        elif encoder == "libvpx-vp9":
+            params.extend(["-crf", str(settings["crf"]), "-b:v", "0", "-cpu-used", str(settings["vp9_speed"])])
+        if settings["max_height"]:
+            params.extend(["-vf", f"scale=-2:'min({settings['max_height']},ih)'"])
+    if "audio" not in copied and output_format in LOSSY_AUDIO_FORMATS:
+        params.extend(["-b:a", settings["audio_bitrate"]])
+    return params
+
+def gif_params(settings):
+    scale = f"fps={settings['gif_fps']},scale={settings['gif_width']}:-1:flags=lanczos"
+    if not settings["gif_palette"]:
+        return ["-vf", scale]
+    # palettegen and paletteuse run as two passes over the same decode inside one filter graph;
+    # the labelled output keeps the graph bound to the GIF when ffmpeg writes several outputs
+    return ["-filter_complex", f"[0:v]{scale},split[a][b];[a]palettegen=stats_mode=diff[p];[b][p]paletteuse=dither=bayer[gif]",
+            "-map", "[gif]"]
+
+def image_profile_params(settings):
+    params = []
+    if settings["image_max_size"]:
+        size = settings["image_max_size"]
+        params.extend(["-resize", f"{size}x{size}>"])
+    params.extend(["-quality", str(settings["image_quality"])])
+    return params
+
+def media_output_params(probe, output_file, format_params=None, profile=None):
+    """ffmpeg options for one output; returns (params, copied stream types)."""
+    output_format = get_file_extension(output_file)
+    settings = PROFILES.get(profile)
+    copied = []
+    if settings and output_format == "gif":
+        format_params = gif_params(settings)
+    elif format_params is None:
+        format_params, copied = stream_copy_params(probe, output_format, settings and settings["max_height"])
+        if settings:
+            format_params = (format_params or []) + profile_media_params(settings, output_format, copied)
+    return format_params or [], copied
+
+async def convert_media(input_file, output_file, format_params=None, timeout=None, profile=None):
+    return (await convert_media_outputs(input_file, [(output_file, format_params)], timeout, profile))[0]
+
+async def convert_media_outputs(input_file, targets, timeout=None, profile=None):
+    """Write every (output_file, format_params) target from a single ffmpeg run, so the input is decoded once."""
+    job = CURRENT_JOB.get()
+    state = {"status": "running"}
+    if job is not None:
+        job["files"][input_file] = state
+    try:
+        cmd = ["ffmpeg", "-y", "-nostats", "-progress", "pipe:1", "-i", input_file]
+        
+        probe = await probe_media(input_file)
+        if probe:
+            try:
+                state["duration"] = float(probe.get("format", {}).get("duration"))
+            except (TypeError, ValueError):
+                pass
+        has_video = not probe or any(stream.get("codec_type") == "video" for stream in probe.get("streams", []))
+        results = []
+        running = []
+        for output_file, format_params in targets:
+            # A target the input cannot feed would fail the whole run, and with it every other output
+            if not has_video and get_file_extension(output_file) in VIDEO_ONLY_FORMATS:
+                results.append({"error": f"{os.path.basename(input_file)} has no video stream to make a "
+                                         f"{get_file_extension(output_file)} from"})
+                continue
+            # ffmpeg options apply to the output file that follows them
+            params, copied = media_output_params(probe, output_file, format_params, profile)
+            cmd.extend(params)
+            cmd.append(output_file)
+            result = {"success": True, "output_file": output_file}
+            if copied:
+                result["stream_copy"] = copied
+            results.append(result)
+            running.append((len(results) - 1, (output_file, format_params)))
+        if not running:
+            state["status"] = "failed"
+            return results
         
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        returncode, stderr = await run_ffmpeg(cmd, [target[0] for _, target in running], timeout, state)
+        state["status"] = "completed" if returncode == 0 else "failed"
         
-        if result.returncode != 0:
-            return {"error": f"FFmpeg error: {result.stderr}"}
+        if returncode != 0 and len(running) > 1:
+            # One bad output fails the shared run; retry each alone so the others still get written
+            for index, target in running:
+                results[index] = (await convert_media_outputs(input_file, [target], timeout, profile))[0]
+        elif returncode != 0:
+            results[running[0][0]] = {"error": f"FFmpeg error: {stderr}"}
         
-        return {"success": True, "output_file": output_file}
+        return results
+    except asyncio.CancelledError:
+        state["status"] = "cancelled"
+        raise
+    except asyncio.TimeoutError:
+        state["status"] = "failed"
+        return [{"error": f"Media conversion timed out after {timeout} seconds"} for _ in targets]
     except Exception as e:
-        return {"error": f"Media conversion failed: {str(e)}"}
+        state["status"] = "failed"
+        return [{"error": f"Media conversion failed: {str(e)}"} for _ in targets]
+
+async def convert_image(input_file, output_file, format_params=None, timeout=None, profile=None):
+    return (await convert_image_outputs(input_file, [output_file], format_params, timeout, profile))[0]
 
-def convert_image(input_file, output_file, format_params=None):
+async def convert_image_outputs(input_file, output_files, format_params=None, timeout=None, profile=None):
+    """Write every output file from one ImageMagick decode, using -write for all but the last."""
     try:
         cmd = ["convert", input_file]
         
         if format_params:
             cmd.extend(format_params)
-            
-        cmd.append(output_file)
+        if profile in PROFILES:
+            cmd.extend(image_profile_params(PROFILES[profile]))
+        
+        for output_file in output_files[:-1]:
+            cmd.extend(["-write", output_file])
+        cmd.append(output_files[-1])
         
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        returncode, stderr = await run_command(cmd, output_files, timeout)
         
-        if result.returncode != 0:
-            return {"error": f"ImageMagick error: {result.stderr}"}
+        if returncode != 0:
+            return [{"error": f"ImageMagick error: {stderr}"} for _ in output_files]
         
-        return {"success": True, "output_file": output_file}
+        return [{"success": True, "output_file": output_file} if os.path.exists(output_file)
+                else {"error": "ImageMagick did not produce an output file"} for output_file in output_files]
+    except asyncio.TimeoutError:
+        return [{"error": f"Image conversion timed out after {timeout} seconds"} for _ in output_files]
     except Exception as e:
-        return {"error": f"Image conversion failed: {str(e)}"}
+        return [{"error": f"Image conversion failed: {str(e)}"} for _ in output_files]
 
 def get_conversion_command(input_ext, output_ext):
     media_formats = ["mp3", "mp4", "wav", "flac", "ogg", "avi", "mkv", "webm", "m4a", "aac"]
@@ -100,7 +495,196 @@ def get_conversion_command(input_ext, output_ext):
         
         return None, None
 
-def process_file(input_file, output_format, output_file=None):
+def open_manifest():
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    conn = sqlite3.connect(MANIFEST_FILE)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS conversions (
+            input_path TEXT NOT NULL,
+            output_format TEXT NOT NULL,
+            params TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            content_hash TEXT NOT NULL,
+            output_file TEXT NOT NULL,
+            PRIMARY KEY (input_path, output_format, params)
+        );
+        CREATE INDEX IF NOT EXISTS conversions_hash ON conversions(content_hash, output_format, params);
+    """)
+    return conn
+
+def query_manifest(conn, sql, params):
+    """All rows for sql, from conn or from a connection that is closed straight away."""
+    if conn is not None:
+        return conn.execute(sql, params).fetchall()
+    conn = open_manifest()
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+def file_hash(path):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(1024 * 1024)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def is_up_to_date(output_file, stat):
+    try:
+        return os.stat(output_file).st_mtime_ns >= stat.st_mtime_ns
+    except OSError:
+        return False
+
+def reuse_output(existing, output_file):
+    """Link an already converted output into place, copying when hardlinks are not possible."""
+    if os.path.exists(output_file):
+        os.remove(output_file)
+    try:
+        os.link(existing, output_file)
+    except OSError:
+        shutil.copy2(existing, output_file)
+
+PILLOW_FORMATS = {
+    "jpg": "JPEG", "jpeg": "JPEG", "png": "PNG", "gif": "GIF", "bmp": "BMP",
+    "tiff": "TIFF", "webp": "WEBP", "pdf": "PDF"
+}
+MOGRIFY_BATCH = 32
+PILLOW = None
+IMAGE_EXECUTOR = None
+
+def get_pillow():
+    """Import Pillow on first use; returns the Image module or None when it is not installed."""
+    global PILLOW
+    if PILLOW is None:
+        try:
+            from PIL import Image
+            Image.init()
+            PILLOW = Image
+        except ImportError:
+            PILLOW = False
+    return PILLOW or None
+
+def get_image_executor():
+    global IMAGE_EXECUTOR
+    if IMAGE_EXECUTOR is None:
+        IMAGE_EXECUTOR = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="file_converter")
+    return IMAGE_EXECUTOR
+
+def can_use_pillow(task):
+    Image = get_pillow()
+    return (Image is not None and task["converter"] == "image" and not task["params"]
+            and task["input_ext"] != "svg" and PILLOW_FORMATS.get(task["output_format"]) in Image.SAVE)
+
+def pillow_convert(input_file, targets, max_size=None, quality=92):
+    """Decode one image in-process and save it as every (output_file, output_format) target.
+
+    Returns False when ImageMagick should handle it instead.
+    """
+    Image = get_pillow()
+    with Image.open(input_file) as img:
+        if getattr(img, "n_frames", 1) > 1:
+            return False
+        if max_size:
+            # JPEG draft mode decodes at a reduced scale instead of decoding full size and shrinking
+            img.draft("RGB", (max_size, max_size))
+            img.thumbnail((max_size, max_size))
+        img.load()
+        flattened = None
+        for output_file, output_format in targets:
+            image_format = PILLOW_FORMATS[output_format]
+            out = img
+            if image_format in ("JPEG", "PDF") and img.mode not in ("RGB", "L"):
+                if flattened is None:
+                    rgba = img.convert("RGBA")
+                    flattened = Image.new("RGB", rgba.size, (255, 255, 255))
+                    flattened.paste(rgba, mask=rgba.getchannel("A"))
+                out = flattened
+            options = {"quality": quality} if image_format in ("JPEG", "WEBP") else {}
+            out.save(output_file, image_format, **options)
+    return True
+
+def release_output(output_file):
+    # A reused output may be hardlinked to another file; never write through the shared inode
+    if os.path.exists(output_file) and os.stat(output_file).st_nlink > 1:
+        os.remove(output_file)
+
+async def run_conversion(task, timeout):
+    return (await run_conversions([task], timeout))[0]
+
+async def run_conversions(tasks, timeout):
+    """Convert one input into every task's output with a single decode.
+
+    All tasks share input_file, converter, params and profile; only the output differs.
+    """
+    first = tasks[0]
+    for task in tasks:
+        release_output(task["output_file"])
+    if first["converter"] == "media":
+        targets = [(task["output_file"], task["params"]) for task in tasks]
+        return await convert_media_outputs(first["input_file"], targets, timeout, first["profile"])
+    if all(can_use_pillow(task) for task in tasks):
+        loop = asyncio.get_running_loop()
+        settings = PROFILES.get(first["profile"], {})
+        targets = [(task["output_file"], task["output_format"]) for task in tasks]
+        try:
+            handled = await asyncio.wait_for(loop.run_in_executor(
+                get_image_executor(), pillow_convert, first["input_file"], targets,
+                settings.get("image_max_size"), settings.get("image_quality", 92)
+            ), timeout)
+            if handled:
+                return [{"success": True, "output_file": task["output_file"]} for task in tasks]
+        except asyncio.TimeoutError:
+            return [{"error": f"Image conversion timed out after {timeout} seconds"} for _ in tasks]
+        except Exception as e:
+            if not find_tool("convert"):
+                return [{"error": f"Image conversion failed: {str(e)}"} for _ in tasks]
+    return await convert_image_outputs(first["input_file"], [task["output_file"] for task in tasks], first["params"],
+                                       timeout, first["profile"])
+
+def mogrify_key(task):
+    """Group key for tasks one mogrify call can convert, or None if the output name rules it out."""
+    if task["converter"] != "image":
+        return None
+    output_dir = os.path.dirname(task["output_file"])
+    stem = os.path.splitext(os.path.basename(task["input_file"]))[0]
+    if task["output_file"] != os.path.join(output_dir, f"{stem}.{task['output_format']}"):
+        return None
+    return output_dir, task["output_format"], json.dumps([task["params"], task["profile"]])
+
+async def run_mogrify(tasks, timeout):
+    """Convert many images with one mogrify spawn, falling back to one convert per file on failure."""
+    output_dir, output_format, _ = mogrify_key(tasks[0])
+    for task in tasks:
+        release_output(task["output_file"])
+    cmd = ["mogrify", "-path", output_dir, "-format", output_format]
+    cmd.extend(tasks[0]["params"] or [])
+    if tasks[0]["profile"] in PROFILES:
+        cmd.extend(image_profile_params(PROFILES[tasks[0]["profile"]]))
+    cmd.extend(task["input_file"] for task in tasks)
+    try:
+        returncode, _ = await run_command(cmd, [task["output_file"] for task in tasks], timeout * len(tasks))
+    except asyncio.TimeoutError:
+        return [{"error": f"Image conversion timed out after {timeout * len(tasks)} seconds"} for _ in tasks]
+    if returncode != 0:
+        return [await convert_image(task["input_file"], task["output_file"], task["params"], timeout, task["profile"])
+                for task in tasks]
+    return [{"success": True, "output_file": task["output_file"]} if os.path.exists(task["output_file"])
+            else {"error": "ImageMagick did not produce an output file"} for task in tasks]
+
+async def prepare_file(input_file, output_format, output_file=None, use_cache=True, profile=None, dry_run=False,
+                       conn=None):
+    """Work out what converting input_file needs.
+
+    Returns (task, None) when a conversion has to run, or (None, result) when the
+    file is unsupported, already up to date, or can reuse an identical conversion.
+    With dry_run nothing is created, linked or recorded. conn is a manifest connection
+    shared by a batch; without one, each lookup opens and closes its own.
+    """
     input_ext = get_file_extension(input_file)
     
     if not output_file:
@@ -108,28 +692,272 @@ def process_file(input_file, output_format, output_file=None):
         base_name = os.path.splitext(os.path.basename(input_file))[0]
         output_file = os.path.join(output_dir, f"{base_name}.{output_format}")
     
-    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    if not dry_run:
+        os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
     
     converter_type, params = get_conversion_command(input_ext, output_format)
     
     if not converter_type:
-        return {"error": f"Conversion from {input_ext} to {output_format} is not supported", "file": input_file}
+        return None, {"error": f"Conversion from {input_ext} to {output_format} is not supported", "file": input_file}
     
-    if converter_type == "media":
-        result = convert_media(input_file, output_file, params)
-    elif converter_type == "image":
-        result = convert_image(input_file, output_file, params)
-    else:
-        return {"error": "Unknown converter type", "file": input_file}
+    if converter_type not in ("media", "image"):
+        return None, {"error": "Unknown converter type", "file": input_file}
+    
+    task = {
+        "input_file": input_file,
+        "output_file": output_file,
+        "output_format": output_format,
+        "input_ext": input_ext,
+        "converter": converter_type,
+        "params": params,
+        "profile": profile,
+        "cache": None
+    }
+    if not use_cache or os.path.abspath(input_file) == os.path.abspath(output_file):
+        return task, None
     
+    input_path = os.path.abspath(input_file)
+    output_file = task["output_file"] = os.path.abspath(output_file)
+    params_key = json.dumps([converter_type, params] + ([profile] if profile else []))
+    stat = os.stat(input_path)
+    rows = query_manifest(
+        conn, "SELECT size, mtime_ns, output_file FROM conversions WHERE input_path = ? AND output_format = ? AND params = ?",
+        (input_path, output_format, params_key))
+    if rows and rows[0][0] == stat.st_size and rows[0][1] == stat.st_mtime_ns and rows[0][2] == output_file \
+            and is_up_to_date(output_file, stat):
+        return None, {"success": True, "output_file": output_file, "input_file": input_file, "skipped": True}
+    
+    content_hash = await asyncio.to_thread(file_hash, input_path)
+    key = (content_hash, output_format, params_key)
+    if key in IN_FLIGHT:
+        await asyncio.shield(IN_FLIGHT[key])
+    
+    task["cache"] = {"input_path": input_path, "params_key": params_key, "size": stat.st_size,
+                     "mtime_ns": stat.st_mtime_ns, "hash": content_hash}
+    for (existing,) in query_manifest(
+            conn, "SELECT output_file FROM conversions WHERE content_hash = ? AND output_format = ? AND params = ?", key):
+        if not os.path.exists(existing):
+            continue
+        result = {"success": True, "output_file": output_file, "input_file": input_file}
+        if existing != output_file:
+            result["reused_from"] = existing
+        if dry_run:
+            return None, result
+        if existing != output_file:
+            reuse_output(existing, output_file)
+        return None, record_result(task, result, conn)
+    return task, None
+
+def cache_key(task):
+    if task["cache"] is None:
+        return None
+    return task["cache"]["hash"], task["output_format"], task["cache"]["params_key"]
+
+def record_result(task, result, conn=None):
+    """Attach the input file to result and remember successful conversions in the manifest."""
     if "error" in result:
-        result["file"] = input_file
+        result["file"] = task["input_file"]
+        return result
+    if task["cache"] is not None:
+        cache = task["cache"]
+        own_conn = conn is None
+        conn = conn or open_manifest()
+        try:
+            conn.execute("INSERT OR REPLACE INTO conversions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (cache["input_path"], task["output_format"], cache["params_key"], cache["size"],
+                          cache["mtime_ns"], cache["hash"], task["output_file"]))
+            conn.commit()
+        finally:
+            if own_conn:
+                conn.close()
+    return {"input_file": task["input_file"], **result}
+
+async def process_file(input_file, output_format, output_file=None, timeout=None, use_cache=True, profile=None):
+    task, result = await prepare_file(input_file, output_format, output_file, use_cache, profile)
+    if result is not None:
         return result
     
-    return {"success": True, "output_file": output_file, "input_file": input_file}
+    # Only the first of several identical conversions registers; the others must not replace or pop its future
+    key = cache_key(task)
+    future = None
+    if key is not None and key not in IN_FLIGHT:
+        future = IN_FLIGHT[key] = asyncio.get_running_loop().create_future()
+    try:
+        result = await run_conversion(task, timeout)
+    finally:
+        if future is not None:
+            del IN_FLIGHT[key]
+            future.set_result(None)
+    return record_result(task, result)
+
+def output_pairs(files, output_formats):
+    """(input, format) pairs to convert; with several formats, pairs that cannot or need not convert are dropped."""
+    if len(output_formats) == 1:
+        return [(f, output_formats[0]) for f in files]
+    pairs = []
+    for f in files:
+        file_ext = get_file_extension(f)
+        wanted = [fmt for fmt in output_formats
+                  if fmt != file_ext and get_conversion_command(file_ext, fmt)[0] is not None]
+        # Keep one pair for an input nothing applies to, so it still reports an error
+        pairs.extend((f, fmt) for fmt in wanted or output_formats[:1])
+    return pairs
+
+async def plan_batch(files, output_formats, use_cache=True, profile=None, output_file=None, dry_run=False):
+    """Prepare every (file, format) pair and group the remaining work into units, largest first.
+
+    Results that need no conversion are filled in straight away. Inputs with identical
+    content follow a single leader. Several formats for one input share a "multi" unit
+    that decodes it once; otherwise, without Pillow, images that share an output folder
+    are grouped into one mogrify unit instead of one convert per file.
+    """
+    pairs = output_pairs(files, output_formats)
+    
+    def target(f, fmt):
+        if not output_file or len(files) != 1:
+            return None
+        return output_file if len(output_formats) == 1 else f"{os.path.splitext(output_file)[0]}.{fmt}"
+    
+    # One manifest connection for the whole batch, and a bounded number of files open for hashing
+    slots = asyncio.Semaphore(PREPARE_WORKERS)
+    conn = open_manifest() if use_cache else None
+    
+    async def prepare(f, fmt):
+        async with slots:
+            return await prepare_file(f, fmt, target(f, fmt), use_cache, profile, dry_run, conn)
+    
+    try:
+        prepared = await asyncio.gather(*(prepare(f, fmt) for f, fmt in pairs))
+    finally:
+        if conn is not None:
+            conn.close()
+    plan = {"results": [result for _, result in prepared], "units": [], "followers": []}
+    
+    leaders = {}
+    outputs = {}
+    sizes = {}
+    by_input = {}
+    for index, (task, _) in enumerate(prepared):
+        if task is None:
+            continue
+        destination = os.path.abspath(task["output_file"])
+        if destination in outputs:
+            plan["results"][index] = {"error": f"{outputs[destination]} already converts to {task['output_file']}",
+                                      "file": task["input_file"]}
+            continue
+        outputs[destination] = task["input_file"]
+        key = cache_key(task)
+        if key is not None and key in leaders:
+            plan["followers"].append((index, task, leaders[key]))
+            continue
+        if key is not None:
+            leaders[key] = task
+        try:
+            sizes[index] = os.path.getsize(task["input_file"])
+        except OSError:
+            sizes[index] = 0
+        by_input.setdefault((task["input_file"], task["converter"]), []).append((index, task))
+    
+    mogrify_groups = {}
+    use_mogrify = get_pillow() is None and find_tool("mogrify") is not None
+    for members in by_input.values():
+        if len(members) > 1:
+            plan["units"].append({"kind": "multi", "members": members})
+            continue
+        group = mogrify_key(members[0][1]) if use_mogrify else None
+        if group is not None:
+            mogrify_groups.setdefault(group, []).extend(members)
+        else:
+            plan["units"].append({"kind": "single", "members": members})
+    for members in mogrify_groups.values():
+        members.sort(key=lambda member: sizes[member[0]], reverse=True)
+        plan["units"].extend({"kind": "mogrify" if len(members[i:i + MOGRIFY_BATCH]) > 1 else "single",
+                              "members": members[i:i + MOGRIFY_BATCH]}
+                             for i in range(0, len(members), MOGRIFY_BATCH))
+    
+    # Semaphores wake waiters in order, so starting the longest work first packs the slots tighter.
+    # A multi unit decodes its input once, so it weighs as one input, not one per output.
+    def weight(unit):
+        indexes = [index for index, _ in unit["members"]]
+        return sizes[indexes[0]] if unit["kind"] == "multi" else sum(sizes[index] for index in indexes)
+    
+    plan["units"].sort(key=weight, reverse=True)
+    plan["sizes"] = sizes
+    return plan
+
+def describe_plan(plan):
+    steps = []
+    for unit in plan["units"]:
+        task = unit["members"][0][1]
+        if unit["kind"] == "mogrify":
+            tool = "mogrify"
+        elif task["converter"] == "media":
+            tool = "ffmpeg"
+        else:
+            tool = "pillow" if all(can_use_pillow(t) for _, t in unit["members"]) else "convert"
+        steps.append({
+            "tool": tool,
+            "kind": unit["kind"],
+            "profile": task["profile"],
+            "files": [{"input_file": task["input_file"], "output_file": task["output_file"], "size": plan["sizes"][index]}
+                      for index, task in unit["members"]]
+        })
+    
+    done = [result for result in plan["results"] if result is not None]
+    reuse = [{"input_file": task["input_file"], "output_file": task["output_file"], "reused_from": leader["output_file"]}
+             for _, task, leader in plan["followers"]]
+    reuse.extend(r for r in done if "reused_from" in r)
+    return {
+        "dry_run": True,
+        "files_total": len(plan["results"]),
+        "conversions": sum(len(step["files"]) for step in steps),
+        "steps": steps,
+        "reuse": reuse,
+        "up_to_date": [r["input_file"] for r in done if r.get("skipped")],
+        "errors": [r for r in done if "error" in r]
+    }
+
+async def convert_batch(files, output_formats, max_jobs=MAX_CONCURRENT_JOBS, timeout=CONVERSION_TIMEOUT, use_cache=True,
+                        profile=None, output_file=None):
+    """Convert files concurrently, with separate image and media limits under one global cap."""
+    global_slots = asyncio.Semaphore(max(1, max_jobs))
+    kind_slots = {"image": asyncio.Semaphore(IMAGE_WORKERS), "media": asyncio.Semaphore(MEDIA_WORKERS)}
+    plan = await plan_batch(files, output_formats, use_cache, profile, output_file)
+    results = plan["results"]
+    job = CURRENT_JOB.get()
+    progress = job["progress"] if job is not None else {}
+    progress.update({"files_total": len(results), "files_done": sum(1 for r in results if r is not None)})
+    
+    async def run(unit):
+        members = unit["members"]
+        tasks = [task for _, task in members]
+        async with kind_slots[tasks[0]["converter"]]:
+            async with global_slots:
+                if unit["kind"] == "mogrify":
+                    unit_results = await run_mogrify(tasks, timeout)
+                else:
+                    unit_results = await run_conversions(tasks, timeout * len(tasks))
+        for (index, task), result in zip(members, unit_results):
+            results[index] = record_result(task, result)
+        progress["files_done"] += len(members)
+    
+    await asyncio.gather(*(run(unit) for unit in plan["units"]))
+    
+    for index, task, leader in plan["followers"]:
+        if not os.path.exists(leader["output_file"]):
+            results[index] = record_result(task, {"error": "Conversion of an identical file failed"})
+            continue
+        reuse_output(leader["output_file"], task["output_file"])
+        results[index] = record_result(task, {"success": True, "output_file": task["output_file"],
+                                              "reused_from": leader["output_file"]})
+    return results
 
 def open_file_explorer(folder=False):
     try:
+        # Imported here so headless machines without a display or Tk can still load the module
+        import tkinter as tk
+        from tkinter import filedialog
+        
         root = tk.Tk()
         root.withdraw()
         
@@ -147,34 +975,72 @@ def open_file_explorer(folder=False):
         print(f"Error opening file explorer: {str(e)}")
         return None
 
-async def function(args):
+def expand_path(path):
+    if path.startswith('~'):
+        path = os.path.join(os.path.expanduser('~'),
+            path[2:] if path.startswith('~/') or path.startswith('~\\')
+            else path[1:])
+    return os.path.normpath(path).replace('\\', '/')
+
+def is_pattern(path):
+    return not os.path.exists(path) and any(c in path for c in "*?[")
+
+def expand_inputs(paths, output_formats):
+    """Turn files, folders and glob patterns into one de-duplicated list of files to convert.
+
+    Files named explicitly are always kept, so unsupported ones still get an error;
+    files found in folders or through patterns are kept only when they can be converted.
+    Returns (files, paths that matched nothing).
+    """
+    files = []
+    missing = []
+    seen = set()
+    
+    def add(file_path, explicit):
+        real = os.path.realpath(file_path)
+        if real in seen:
+            return
+        file_ext = get_file_extension(file_path)
+        if not explicit and not any(fmt != file_ext and get_conversion_command(file_ext, fmt)[0]
+                                    for fmt in output_formats):
+            return
+        seen.add(real)
+        files.append(file_path)
+    
+    def add_folder(folder):
+        for root, _, names in os.walk(folder):
+            for name in sorted(names):
+                add(os.path.join(root, name), False)
+    
+    for path in paths:
+        if is_pattern(path):
+            matches = sorted(glob.glob(path, recursive=True))
+            if not matches:
+                missing.append(path)
+            for match in matches:
+                if os.path.isdir(match):
+                    add_folder(match)
+                elif os.path.isfile(match):
+                    add(match, False)
+        elif os.path.isdir(path):
+            add_folder(path)
+        elif os.path.isfile(path):
+            add(path, True)
+        else:
+            missing.append(path)
+    return files, missing
+
+async def convert_request(args):
     try:
-        if isinstance(args, str):
-            try:
-                args = json.loads(args.replace('\\', '\\\\'))
-            except json.JSONDecodeError:
-                args = {"input_file": args}
-        
-        input_path = args.get("input_file", "")
-        if input_path.startswith('~'):
-            input_path = os.path.join(os.path.expanduser('~'), 
-                input_path[2:] if input_path.startswith('~/') or input_path.startswith('~\\') 
-                else input_path[1:])
-        input_path = os.path.normpath(input_path)
+        input_path = expand_path(args.get("input_file", ""))
         
         output_file = args.get("output_file", "")
         if output_file:
-            if output_file.startswith('~'):
-                output_file = os.path.join(os.path.expanduser('~'),
-                    output_file[2:] if output_file.startswith('~/') or output_file.startswith('~\\')
-                    else output_file[1:])
-            output_file = os.path.normpath(output_file)
-        
-        output_format = args.get("output_format", "").lower()
+            output_file = expand_path(output_file)
         
-        input_path = input_path.replace('\\', '/')
-        if output_file:
-            output_file = output_file.replace('\\', '/')
+        output_format = args.get("output_format", "")
+        output_formats = [fmt.lower() for fmt in ([output_format] if isinstance(output_format, str) else output_format) if fmt]
+        extra_inputs = [expand_path(path) for path in args.get("input_files") or []]
         
         if args.get("use_latest", False):
             if not os.path.isdir(input_path):
@@ -187,7 +1053,11 @@ async def function(args):
             input_path = latest
             print(f"Using latest file: {input_path}")
         
-        if not input_path or not os.path.exists(input_path):
+        # A pattern that matches nothing is a mistake in the pattern, not a request to pick a file
+        if not extra_inputs and is_pattern(input_path) and not glob.glob(input_path, recursive=True):
+            return json.dumps({"error": "Path not found", "file": input_path})
+        
+        if not extra_inputs and not os.path.exists(input_path) and not is_pattern(input_path):
             print(f"Path '{input_path}' not found. Opening file explorer...")
             selected_path = open_file_explorer(folder=args.get("folder_mode", False))
             
@@ -197,7 +1067,7 @@ async def function(args):
             input_path = selected_path
             print(f"Selected path: {input_path}")
         
-        if not output_format:
+        if not output_formats:
             return json.dumps({"error": "Output format not specified"})
         
         supported_formats = [
@@ -206,33 +1076,48 @@ async def function(args):
             "jpg", "jpeg", "png", "gif", "bmp", "tiff", "webp", "svg", "pdf"
         ]
         
-        if output_format not in supported_formats:
-            return json.dumps({
-                "error": f"Output format '{output_format}' not supported",
-                "supported_formats": supported_formats
-            })
+        for output_format in output_formats:
+            if output_format not in supported_formats:
+                return json.dumps({
+                    "error": f"Output format '{output_format}' not supported",
+                    "supported_formats": supported_formats
+                })
+        output_formats = list(dict.fromkeys(output_formats))
         
         tools_check = ensure_tools_installed()
         if "error" in tools_check:
             return json.dumps(tools_check)
         
         results = []
+        timeout = float(args.get("timeout", CONVERSION_TIMEOUT))
+        use_cache = not args.get("force", False)
+        profile = args.get("profile") or DEFAULT_PROFILE
+        if profile and profile not in PROFILES:
+            return json.dumps({"error": f"Unknown profile '{profile}'", "profiles": list(PROFILES)})
+        started = time.monotonic()
+        
+        inputs = [input_path] if args.get("input_file") or not extra_inputs else []
+        files, missing = expand_inputs(inputs + extra_inputs, output_formats)
+        single_file = len(inputs + extra_inputs) == 1 and os.path.isfile((inputs + extra_inputs)[0])
         
-        if os.path.isfile(input_path):
-            result = process_file(input_path, output_format, output_file)
+        if args.get("dry_run", False):
+            plan = await plan_batch(files, output_formats, use_cache, profile, output_file if single_file else None,
+                                    dry_run=True)
+            summary = describe_plan(plan)
+            summary["errors"].extend({"error": "Path not found", "file": path} for path in missing)
+            return json.dumps(summary)
+        
+        if single_file and len(output_formats) == 1:
+            result = await process_file(files[0], output_formats[0], output_file, timeout, use_cache, profile)
             results.append(result)
-        elif os.path.isdir(input_path):
-            for root, _, files in os.walk(input_path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    file_ext = get_file_extension(file_path)
-                    
-                    converter_type, _ = get_conversion_command(file_ext, output_format)
-                    if converter_type:
-                        result = process_file(file_path, output_format)
-                        results.append(result)
+        else:
+            max_jobs = int(args.get("max_jobs", MAX_CONCURRENT_JOBS))
+            results = await convert_batch(files, output_formats, max_jobs, timeout, use_cache, profile,
+                                          output_file if single_file else None)
+        results.extend({"error": "Path not found", "file": path} for path in missing)
         
         success_count = sum(1 for r in results if r.get("success", False))
+        skipped_count = sum(1 for r in results if r.get("skipped", False))
         
         if not results:
             return json.dumps({
@@ -246,12 +1131,287 @@ async def function(args):
         return json.dumps({
             "success": success_count > 0,
             "message": f"Converted {success_count} of {len(results)} files",
+            "failed": len(results) - success_count,
+            "skipped": skipped_count,
+            "elapsed": round(time.monotonic() - started, 3),
             "details": results
         })
         
     except Exception as e:
         return json.dumps({"error": str(e)})
 
+async def benchmark_profiles(args):
+    """Convert one sample with every profile into a scratch folder and compare time against output size."""
+    input_path = os.path.expanduser(args.get("input_file", ""))
+    output_format = args.get("output_format", "").lower()
+    if not os.path.isfile(input_path):
+        return {"error": "benchmark needs a single existing input_file"}
+    if not output_format:
+        return {"error": "No output format specified"}
+    
+    input_size = os.path.getsize(input_path)
+    timeout = float(args.get("timeout", CONVERSION_TIMEOUT))
+    scratch = tempfile.mkdtemp(prefix="scripty-benchmark-")
+    results = []
+    try:
+        for name in PROFILES:
+            output_file = os.path.join(scratch, f"{name}.{output_format}")
+            started = time.monotonic()
+            result = await process_file(input_path, output_format, output_file, timeout, False, name)
+            elapsed = time.monotonic() - started
+            entry = {"profile": name, "elapsed": round(elapsed, 3)}
+            if result.get("success") and os.path.exists(output_file):
+                output_size = os.path.getsize(output_file)
+                entry.update({
+                    "output_size": output_size,
+                    "size_ratio": round(output_size / input_size, 4) if input_size else None,
+                    "input_mb_per_sec": round(input_size / 1048576 / elapsed, 3) if elapsed else None
+                })
+            else:
+                entry["error"] = result.get("error", "conversion failed")
+            results.append(entry)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    
+    return {
+        "input_file": input_path,
+        "input_size": input_size,
+        "output_format": output_format,
+        "tools": {tool: tool_version(tool) for tool in ("ffmpeg", "convert") if find_tool(tool)},
+        "results": results
+    }
+
+async def make_fixture(kind, path, seed):
+    """Write a small synthetic fixture; each seed gives different content so the cache cannot dedupe them."""
+    if kind == "audio":
+        cmd = ["ffmpeg", "-y", "-v", "error", "-f", "lavfi", "-i", f"sine=frequency={220 + seed * 55}:duration=5",
+               "-ac", "2", path]
+    elif kind == "video":
+        cmd = ["ffmpeg", "-y", "-v", "error", "-f", "lavfi", "-i", "testsrc2=size=640x360:rate=25:duration=3",
+               "-f", "lavfi", "-i", f"sine=frequency={330 + seed * 55}:duration=3",
+               "-vf", f"hue=h={seed * 40}", "-pix_fmt", "yuv420p", "-shortest", path]
+    elif find_tool("convert"):
+        cmd = ["convert", "-size", "1920x1080", "-seed", str(seed + 1), "plasma:", path]
+    else:
+        Image = get_pillow()
+        if Image is None:
+            return False
+        await asyncio.to_thread(lambda: Image.effect_mandelbrot((1920, 1080), (-2 + seed * 0.1, -1.2, 1, 1.2), 100)
+                                .convert("RGB").save(path))
+        return True
+    returncode, _ = await run_command(cmd, [path], CONVERSION_TIMEOUT)
+    return returncode == 0 and os.path.exists(path)
+
+def usage_snapshot():
+    """CPU seconds and peak RSS (bytes) for this process and its finished children, where the OS reports them."""
+    try:
+        import resource
+    except ImportError:
+        return {"cpu": time.process_time(), "peak_rss": None}
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    scale = 1 if PLATFORM == "darwin" else 1024
+    own_peak = own.ru_maxrss * scale
+    # Linux carries the parent's peak across exec into ru_maxrss; VmHWM covers this process alone
+    try:
+        with open("/proc/self/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    own_peak = int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return {
+        "cpu": own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime,
+        "peak_rss": max(own_peak, children.ru_maxrss * scale)
+    }
+
+async def run_case(case):
+    """Run one benchmark case in this process; measure() starts a fresh one per case."""
+    before = usage_snapshot()
+    started = time.perf_counter()
+    if case["single"]:
+        results = [await process_file(case["files"][0], case["formats"][0], None, case["timeout"], False, case["profile"])]
+    else:
+        results = await convert_batch(case["files"], case["formats"], case["max_jobs"], case["timeout"], False,
+                                      case["profile"])
+    wall = time.perf_counter() - started
+    after = usage_snapshot()
+    succeeded = sum(1 for r in results if r.get("success"))
+    return {
+        "files": len(results),
+        "failed": len(results) - succeeded,
+        "wall_seconds": round(wall, 4),
+        "cpu_seconds": round(after["cpu"] - before["cpu"], 4),
+        "peak_rss": after["peak_rss"],
+        "files_per_sec": round(succeeded / wall, 3) if wall else None
+    }
+
+# Loads this file under its own name in the child and prints run_case's result as the last line
+BENCHMARK_RUNNER = """
+import asyncio, importlib.util, json, sys
+spec = importlib.util.spec_from_file_location("file_converter_benchmark", sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+print(json.dumps(asyncio.run(module.run_case(json.loads(sys.argv[2])))))
+"""
+
+async def measure(name, files, formats, max_jobs=None, timeout=CONVERSION_TIMEOUT, profile=None):
+    """Run one case in a fresh interpreter, so its peak RSS is not the high-water mark of earlier cases."""
+    case = {"files": files, "formats": formats, "single": max_jobs is None, "max_jobs": max_jobs,
+            "timeout": timeout, "profile": profile}
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, "-c", BENCHMARK_RUNNER, os.path.abspath(__file__), json.dumps(case),
+        stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await proc.communicate()
+    except asyncio.CancelledError:
+        proc.kill()
+        await proc.wait()
+        raise
+    entry = {"name": name}
+    lines = stdout.decode('utf-8', errors='replace').strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        tail = stderr.decode('utf-8', errors='replace').strip().splitlines()[-STDERR_TAIL_LINES:]
+        entry.update({"error": "\n".join(tail) or f"Benchmark case exited with {proc.returncode}",
+                      "files_per_sec": None})
+    else:
+        entry.update(json.loads(lines[-1]))
+    entry["input_bytes"] = sum(os.path.getsize(f) for f in files)
+    return entry
+
+def matching_report(history, report):
+    """The newest saved report run with the same settings as report, or None."""
+    for path in reversed(history):
+        try:
+            with open(path, 'r') as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if all(previous.get(key) == report[key] for key in BENCHMARK_SETTINGS):
+            return path, previous
+    return None
+
+def compare_runs(previous, current):
+    baseline = {entry["name"]: entry for entry in previous.get("results", [])}
+    regressions = []
+    for entry in current:
+        before = baseline.get(entry["name"])
+        if not before or not before.get("files_per_sec") or entry["files_per_sec"] is None:
+            continue
+        change = entry["files_per_sec"] / before["files_per_sec"] - 1
+        if change < -BENCHMARK_TOLERANCE:
+            regressions.append({"name": entry["name"], "files_per_sec": entry["files_per_sec"],
+                                "previous": before["files_per_sec"], "change": round(change, 3)})
+    return regressions
+
+async def benchmark_suite(args):
+    """Convert synthetic fixtures single-file and in folder mode at several concurrency levels.
+
+    Every run is stored as JSON under BENCHMARK_DIR and compared with the latest one made
+    with the same BENCHMARK_SETTINGS, so throughput regressions show up between changes.
+    """
+    ensure = ensure_tools_installed()
+    if "error" in ensure:
+        return ensure
+    max_jobs = int(args.get("max_jobs", MAX_CONCURRENT_JOBS))
+    levels = sorted({1, min(2, max_jobs), max_jobs})
+    timeout = float(args.get("timeout", CONVERSION_TIMEOUT))
+    profile = args.get("profile") or DEFAULT_PROFILE
+    scratch = tempfile.mkdtemp(prefix="scripty-benchmark-")
+    results = []
+    skipped = []
+    try:
+        for kind, source_ext, formats in BENCHMARK_CASES:
+            folder = os.path.join(scratch, kind)
+            os.makedirs(folder)
+            fixtures = [os.path.join(folder, f"fixture{i}.{source_ext}") for i in range(BENCHMARK_FILES)]
+            made = await asyncio.gather(*(make_fixture(kind, path, i) for i, path in enumerate(fixtures)))
+            if not all(made):
+                skipped.append(kind)
+                continue
+            
+            for output_format in formats:
+                results.append(await measure(f"{kind}/{source_ext}->{output_format}/single", fixtures[:1],
+                                             [output_format], None, timeout, profile))
+                for level in levels:
+                    results.append(await measure(f"{kind}/{source_ext}->{output_format}/folder/jobs={level}",
+                                                 fixtures, [output_format], level, timeout, profile))
+            results.append(await measure(f"{kind}/{source_ext}->{'+'.join(formats)}/folder/jobs={max_jobs}",
+                                         fixtures, formats, max_jobs, timeout, profile))
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    
+    now = datetime.datetime.now()
+    report = {
+        "started": now.isoformat(timespec="seconds"),
+        "platform": PLATFORM,
+        "cpu_count": os.cpu_count(),
+        "profile": profile,
+        "max_jobs": max_jobs,
+        "tools": {tool: tool_version(tool) for tool in ("ffmpeg", "convert") if find_tool(tool)},
+        "pillow": get_pillow() is not None,
+        "results": results,
+        "skipped": skipped
+    }
+    
+    os.makedirs(BENCHMARK_DIR, exist_ok=True)
+    history = sorted(glob.glob(os.path.join(BENCHMARK_DIR, "file_converter-*.json")))
+    match = matching_report(history, report)
+    if match:
+        report["compared_with"] = match[0]
+        report["regressions"] = compare_runs(match[1], results)
+    report_file = os.path.join(BENCHMARK_DIR, f"file_converter-{now.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(report_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    report["report_file"] = report_file
+    return report
+
+async def run_job(args, job):
+    CURRENT_JOB.set(job)
+    try:
+        job["result"] = json.loads(await convert_request(args))
+        job["status"] = "completed"
+    except asyncio.CancelledError:
+        job["result"] = {"error": "Conversion cancelled", "job_id": job["id"]}
+        job["status"] = "cancelled"
+    return job["result"]
+
+async def function(args):
+    try:
+        if isinstance(args, str):
+            try:
+                args = json.loads(args.replace('\\', '\\\\'))
+            except json.JSONDecodeError:
+                args = {"input_file": args}
+        
+        operation = args.get("operation", "convert")
+        if operation in ["job_status", "cancel_job"]:
+            job = JOBS.get(args.get("job_id", ""))
+            if not job:
+                return json.dumps({"error": f"Unknown job: {args.get('job_id', '')}"})
+            if operation == "cancel_job" and job["status"] == "running":
+                job["task"].cancel()
+                try:
+                    await job["task"]
+                except asyncio.CancelledError:
+                    pass
+            return json.dumps(job_summary(job))
+        if operation == "benchmark":
+            return json.dumps(await benchmark_profiles(args))
+        if operation == "benchmark_suite":
+            return json.dumps(await benchmark_suite(args))
+        
+        job = new_job()
+        job["task"] = asyncio.create_task(run_job(args, job))
+        if args.get("background", False):
+            return json.dumps({"message": "Conversion started", "job_id": job["id"]})
+        
+        return json.dumps(await asyncio.shield(job["task"]))
+    except Exception as e:
+        return json.dumps({"error": str(e)})
+
 object = {
     "name": "file_converter",
     "description": """Convert files between various formats (audio, video, images) using local tools.
@@ -269,18 +1429,61 @@ Examples:
 "convert my vacation photos to jpg"
 → {"input_file": "~/Pictures/Vacation/*.png", "output_format": "jpg"}
 
+"convert my lecture recording to mp4 in the background"
+→ {"input_file": "~/Videos/lecture.mkv", "output_format": "mp4", "background": true}
+
+"make an mp3, an ogg and a gif preview of talk.mp4"
+→ {"input_file": "~/Videos/talk.mp4", "output_format": ["mp3", "ogg", "gif"]}
+
+"convert these three clips to webm"
+→ {"input_files": ["~/Videos/a.mov", "~/Videos/b.mov", "~/Desktop/c.mkv"], "output_format": "webm"}
+
+"what would converting my Downloads to mp3 do"
+→ {"input_file": "~/Downloads", "output_format": "mp3", "folder_mode": true, "dry_run": true}
+
+"which quality setting should I use to turn clip.mov into mp4"
+→ {"operation": "benchmark", "input_file": "~/Videos/clip.mov", "output_format": "mp4"}
+
+"convert my holiday videos to mp4 quickly"
+→ {"input_file": "~/Videos/Holiday", "output_format": "mp4", "folder_mode": true, "profile": "fast"}
+
+"how fast is the converter on this machine"
+→ {"operation": "benchmark_suite"}
+
+"how far along is that conversion"
+→ {"operation": "job_status", "job_id": "5b1e0c7a92fd"}
+
 "convert podcast.mp3 to wav and save as audio.wav"
 → {"input_file": "~/Music/podcast.mp3", "output_format": "wav", "output_file": "~/Music/audio.wav""""",
     "parameters": {
         "type": "object",
         "properties": {
+            "operation": {
+                "type": "string",
+                "enum": ["convert", "job_status", "cancel_job", "benchmark", "benchmark_suite"],
+                "description": "convert (default), check on / stop a running conversion by job_id, benchmark every profile on one input_file, or run the synthetic throughput suite and compare it with the previous run"
+            },
+            "job_id": {
+                "type": "string",
+                "description": "For job_status/cancel_job: id returned by a background conversion"
+            },
+            "background": {
+                "type": "boolean",
+                "description": "Start the conversion and return a job_id immediately instead of waiting"
+            },
             "input_file": {
                 "type": "string",
                 "description": "The path to the input file or folder to be converted. Supports ~ for home directory and wildcards for pattern matching."
             },
+            "input_files": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Several files, folders or wildcard patterns to convert together; duplicates are converted once"
+            },
             "output_format": {
-                "type": "string",
-                "description": "The desired output format (e.g., 'mp3', 'wav', 'jpg', etc.)"
+                "type": ["string", "array"],
+                "items": {"type": "string"},
+                "description": "The desired output format (e.g., 'mp3', 'wav', 'jpg', etc.), or a list of formats to produce from one decode of each input"
             },
             "output_file": {
                 "type": "string",
@@ -293,8 +1496,29 @@ Examples:
             "use_latest": {
                 "type": "boolean",
                 "description": "Set to true to convert the most recently modified file in the input directory"
+            },
+            "max_jobs": {
+                "type": "integer",
+                "description": "Maximum number of conversions to run at once in folder mode"
+            },
+            "force": {
+                "type": "boolean",
+                "description": "Set to true to reconvert files even when an up-to-date output already exists"
+            },
+            "dry_run": {
+                "type": "boolean",
+                "description": "Return the planned conversions, reuses and skips without converting anything"
+            },
+            "profile": {
+                "type": "string",
+                "enum": list(PROFILES),
+                "description": "Speed/quality preset: fast (small, quick), balanced, or archive (highest quality). Omit for tool defaults"
+            },
+            "timeout": {
+                "type": "number",
+                "description": "Seconds allowed per file before its conversion is stopped (default: 3600)"
             }
         },
-        "required": ["input_file", "output_format"]
+        "required": []
     }
 }
\ No newline at end of file
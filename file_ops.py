@@ -2,14 +2,1152 @@ from pathlib import Path
 import platform
 import json
 import os
-import glob
 import shutil
 import datetime
+import sqlite3
+import time
+from stat import S_ISDIR, S_ISREG
+import glob
+import hashlib
+import errno
+import heapq
+import bisect
+import fnmatch
+import collections
+import select
+import struct
+import re
+import ctypes
+import ctypes.util
+import threading
+import asyncio
+import uuid
+import mmap
+import multiprocessing
+import importlib.machinery
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 
 public_description = "Handle file operations with smart path resolution."
 PLATFORM = platform.system().lower()
 
-async def function(args):
+INDEX_DIR = os.path.join(os.path.expanduser("~"), ".scripty")
+INDEX_FILE = os.path.join(INDEX_DIR, "file_index.db")
+INDEX_COMMIT_DIRS = 500  # directories rescanned per write transaction, so readers are not blocked by a long walk
+
+OPERATION_WORKERS = 4
+OPERATION_TIMEOUT = 300
+MAX_FINISHED_JOBS = 50
+OPERATION_EXECUTOR = ThreadPoolExecutor(max_workers=OPERATION_WORKERS, thread_name_prefix="file_ops")
+JOBS = {}
+
+class OperationCancelled(Exception):
+    pass
+
+def new_job(operation):
+    finished = [job_id for job_id, job in JOBS.items() if job["status"] != "running"]
+    for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        del JOBS[job_id]
+    job = {
+        "id": uuid.uuid4().hex[:12],
+        "operation": operation,
+        "status": "running",
+        "started": time.time(),
+        "progress": {},
+        "result": None,
+        "cancel": threading.Event()
+    }
+    JOBS[job["id"]] = job
+    return job
+
+def check_cancelled(job):
+    if job is not None and job["cancel"].is_set():
+        raise OperationCancelled("Operation cancelled")
+
+def job_summary(job):
+    summary = {
+        "job_id": job["id"],
+        "operation": job["operation"],
+        "status": job["status"],
+        "elapsed": round(time.time() - job["started"], 3),
+        "progress": dict(job["progress"])
+    }
+    if job["result"] is not None:
+        summary["result"] = job["result"]
+    elif "partial" in job:
+        summary["partial"] = list(job["partial"])
+    return summary
+
+def open_index():
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    conn = sqlite3.connect(INDEX_FILE)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            parent TEXT NOT NULL,
+            name TEXT NOT NULL,
+            size INTEGER,
+            mtime REAL,
+            is_dir INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS files_parent ON files(parent);
+        CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, mtime REAL NOT NULL);
+        CREATE TABLE IF NOT EXISTS roots (path TEXT PRIMARY KEY, refreshed REAL NOT NULL);
+        CREATE TABLE IF NOT EXISTS hashes (
+            dev INTEGER NOT NULL,
+            inode INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            partial TEXT,
+            full TEXT,
+            PRIMARY KEY (dev, inode)
+        );
+    """)
+    return conn
+
+def subtree_bounds(root):
+    """Key range covering every path below root, usable against the primary key."""
+    prefix = root if root.endswith(os.sep) else root + os.sep
+    return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+def remove_subtree(conn, path):
+    low, high = subtree_bounds(path)
+    conn.execute("DELETE FROM files WHERE path >= ? AND path < ?", (low, high))
+    conn.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (path, low, high))
+
+def refresh_index(conn, root, force=False, job=None):
+    """Bring the index for root up to date, rescanning only directories whose mtime changed."""
+    scanned = 0
+    stack = [root]
+    while stack:
+        check_cancelled(job)
+        directory = stack.pop()
+        try:
+            dir_mtime = os.stat(directory).st_mtime
+        except OSError:
+            remove_subtree(conn, directory)
+            continue
+
+        row = conn.execute("SELECT mtime FROM dirs WHERE path = ?", (directory,)).fetchone()
+        if row and row[0] == dir_mtime and not force:
+            stack.extend(r[0] for r in conn.execute(
+                "SELECT path FROM files WHERE parent = ? AND is_dir = 1", (directory,)))
+            continue
+
+        rows = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        stat = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    rows.append((entry.path, directory, entry.name, stat.st_size, stat.st_mtime, int(is_dir)))
+                    if is_dir:
+                        stack.append(entry.path)
+        except OSError:
+            pass
+
+        current = {r[0]: r[5] for r in rows}
+        for path, was_dir in conn.execute("SELECT path, is_dir FROM files WHERE parent = ?", (directory,)).fetchall():
+            if path not in current:
+                conn.execute("DELETE FROM files WHERE path = ?", (path,))
+            if was_dir and not current.get(path):
+                remove_subtree(conn, path)
+
+        conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)", rows)
+        conn.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?)", (directory, dir_mtime))
+        scanned += 1
+        if scanned % INDEX_COMMIT_DIRS == 0:
+            conn.commit()
+        if job is not None:
+            job["progress"]["directories_scanned"] = scanned
+
+    conn.execute("INSERT OR REPLACE INTO roots VALUES (?, ?)", (root, time.time()))
+    conn.commit()
+    return scanned
+
+COPY_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+COPY_CHUNK = 8 * 1024 * 1024
+JOURNAL_DIR = os.path.join(INDEX_DIR, "journals")
+
+def fast_copy(src, dst, on_bytes=None):
+    """Copy file contents, preferring in-kernel copy_file_range/sendfile on Linux."""
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        copied = 0
+        if PLATFORM == "linux":
+            for kernel_copy in (getattr(os, "copy_file_range", None), getattr(os, "sendfile", None)):
+                if kernel_copy is None:
+                    continue
+                try:
+                    while copied < size:
+                        if kernel_copy is os.sendfile:
+                            sent = os.sendfile(fdst.fileno(), fsrc.fileno(), copied, COPY_CHUNK)
+                        else:
+                            sent = os.copy_file_range(fsrc.fileno(), fdst.fileno(), COPY_CHUNK, copied, copied)
+                        if sent == 0:
+                            break
+                        copied += sent
+                        if on_bytes:
+                            on_bytes(sent)
+                    break
+                except OSError as e:
+                    if copied or e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF):
+                        raise
+        if copied < size or size == 0:
+            fsrc.seek(copied)
+            fdst.seek(copied)
+            while True:
+                chunk = fsrc.read(COPY_CHUNK)
+                if not chunk:
+                    break
+                fdst.write(chunk)
+                if on_bytes:
+                    on_bytes(len(chunk))
+    shutil.copystat(src, dst)
+
+def plan_transfer(source, destination, patterns):
+    """Expand glob patterns under source into (src, dst, relative path) triples for every file."""
+    plan = {}
+    for pattern in patterns:
+        for match in glob.glob(os.path.join(source, pattern), recursive=True):
+            if os.path.isdir(match):
+                for root, _, files in os.walk(match):
+                    for name in files:
+                        path = os.path.join(root, name)
+                        plan.setdefault(path, os.path.relpath(path, source))
+            elif os.path.isfile(match):
+                plan.setdefault(match, os.path.relpath(match, source))
+    return [(src, os.path.join(destination, rel), rel) for src, rel in sorted(plan.items())]
+
+def journal_path(operation, source, destination):
+    key = hashlib.sha1(f"{operation}\0{source}\0{destination}".encode('utf-8')).hexdigest()
+    return os.path.join(JOURNAL_DIR, f"{key}.log")
+
+def load_journal(path):
+    done = set()
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.endswith("\n"):
+                    done.add(line[:-1])
+    return done
+
+def journal_key(rel, stat):
+    return f"{rel}\t{stat.st_size}\t{stat.st_mtime_ns}"
+
+def bulk_transfer(operation, source, destination, patterns, workers=COPY_WORKERS, job=None):
+    """Copy or move every file matched by patterns concurrently, resuming from a journal.
+
+    Returns a summary including the number of files transferred and skipped.
+    """
+    plan = plan_transfer(source, destination, patterns)
+    os.makedirs(JOURNAL_DIR, exist_ok=True)
+    journal_file = journal_path(operation, source, destination)
+    done = load_journal(journal_file)
+    total_bytes = 0
+    for src, _, _ in plan:
+        try:
+            total_bytes += os.path.getsize(src)
+        except OSError:
+            pass
+
+    lock = threading.Lock()
+    progress = job["progress"] if job is not None else {}
+    progress.update({"files_done": 0, "files_total": len(plan), "bytes_done": 0, "bytes_total": total_bytes})
+
+    def add_bytes(count):
+        check_cancelled(job)
+        with lock:
+            progress["bytes_done"] += count
+
+    def transfer(item, journal):
+        check_cancelled(job)
+        src, dst, rel = item
+        stat = os.stat(src)
+        key = journal_key(rel, stat)
+        if key in done and os.path.exists(dst) and os.path.getsize(dst) == stat.st_size:
+            add_bytes(stat.st_size)
+            return "skipped"
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        if operation == "move":
+            try:
+                os.replace(src, dst)
+                add_bytes(stat.st_size)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                fast_copy(src, dst, add_bytes)
+                os.remove(src)
+        else:
+            fast_copy(src, dst, add_bytes)
+        with lock:
+            journal.write(key + "\n")
+            journal.flush()
+            progress["files_done"] += 1
+        return "transferred"
+
+    failed = []
+    counts = {"transferred": 0, "skipped": 0}
+    started = time.monotonic()
+    with open(journal_file, 'a', encoding='utf-8') as journal, ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [(item, pool.submit(transfer, item, journal)) for item in plan]
+        for item, future in futures:
+            try:
+                counts[future.result()] += 1
+            except OperationCancelled:
+                for _, pending in futures:
+                    pending.cancel()
+                raise
+            except Exception as e:
+                failed.append({"file": item[0], "error": str(e)})
+
+    if operation == "move":
+        # Only directories strictly below source are emptied away; "**" also matches source itself
+        below = subtree_bounds(os.path.normpath(source))[0]
+        for pattern in patterns:
+            for match in glob.glob(os.path.join(source, pattern), recursive=True):
+                if os.path.isdir(match):
+                    for root, _, _ in sorted(os.walk(match), reverse=True):
+                        if not os.path.normpath(root).startswith(below):
+                            continue
+                        try:
+                            os.rmdir(root)
+                        except OSError:
+                            pass
+
+    if not failed:
+        os.remove(journal_file)
+
+    elapsed = time.monotonic() - started
+    return {
+        "message": f"{'Moved' if operation == 'move' else 'Copied'} {counts['transferred']} files to {destination}",
+        "transferred": counts["transferred"],
+        "skipped": counts["skipped"],
+        "failed": failed,
+        "bytes": progress["bytes_done"],
+        "elapsed": round(elapsed, 3),
+        "bytes_per_second": int(progress["bytes_done"] / elapsed) if elapsed else None
+    }
+
+READ_SNIFF_BYTES = 8192
+READ_MAX_BYTES = 1024 * 1024
+TEXT_BYTES = bytes({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7f})
+
+def looks_binary(prefix):
+    if not prefix:
+        return False
+    if b"\0" in prefix:
+        return True
+    try:
+        prefix.decode('utf-8')
+        return False
+    except UnicodeDecodeError as e:
+        if e.reason == "unexpected end of data":
+            return False
+    # Not UTF-8: still text if it is mostly printable in a single-byte encoding
+    return len(prefix.translate(None, TEXT_BYTES)) / len(prefix) > 0.05
+
+def decode_chunk(data, at_eof):
+    """Decode UTF-8, holding back a multi-byte character split at the end of the chunk."""
+    cut = len(data)
+    if not at_eof:
+        for back in range(1, min(4, len(data)) + 1):
+            byte = data[-back]
+            if byte & 0xC0 != 0x80:
+                width = 4 if byte >= 0xF0 else 3 if byte >= 0xE0 else 2 if byte >= 0xC0 else 1
+                if width > back and back < len(data):
+                    cut = len(data) - back
+                break
+    return data[:cut].decode('utf-8', errors='replace'), cut
+
+def read_range(path, offset, length):
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if offset >= size:
+            return {"content": "", "offset": offset, "next_offset": None, "size": size}
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = min(size, offset + length)
+            content, used = decode_chunk(mm[offset:end], end == size)
+    next_offset = offset + used
+    return {"content": content, "offset": offset, "next_offset": next_offset if next_offset < size else None, "size": size}
+
+def read_head(path, lines):
+    result = []
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if len(result) >= lines:
+                break
+            result.append(line)
+    return {"content": "".join(result), "lines": len(result), "size": os.path.getsize(path)}
+
+def read_tail(path, lines):
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return {"content": "", "lines": 0, "size": 0}
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = size - 1 if mm[size - 1:size] == b"\n" else size
+            start = end
+            for _ in range(lines):
+                start = mm.rfind(b"\n", 0, start)
+                if start < 0:
+                    break
+            start = start + 1 if start >= 0 else 0
+            data = mm[start:size]
+    content = data.decode('utf-8', errors='replace')
+    return {"content": content, "lines": content.count("\n") + (0 if content.endswith("\n") else 1), "size": size}
+
+HASH_EDGE_BYTES = 16 * 1024
+HASH_CHUNK = 1024 * 1024
+
+def partial_hash(path, size):
+    """Hash the first and last HASH_EDGE_BYTES; for small files this is the whole file."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        digest.update(f.read(HASH_EDGE_BYTES))
+        if size > 2 * HASH_EDGE_BYTES:
+            f.seek(size - HASH_EDGE_BYTES)
+            digest.update(f.read(HASH_EDGE_BYTES))
+        elif size > HASH_EDGE_BYTES:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def full_hash(path):
+    """(path, hex digest), with None as the digest when the file went away or cannot be read."""
+    digest = hashlib.blake2b(digest_size=20)
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(HASH_CHUNK)
+                if not chunk:
+                    break
+                digest.update(chunk)
+    except OSError:
+        return path, None
+    return path, digest.hexdigest()
+
+def worker_pool():
+    # Threads rather than forked processes: forking this multithreaded process (job executor,
+    # watchers) can deadlock the child on a lock held by another thread. hashlib releases the GIL.
+    return ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+
+def grep_pool():
+    """Worker processes for grep, since re holds the GIL while matching; threads when they cannot be used."""
+    # forkserver children come from a fresh single-threaded server, not from this process, and load
+    # grep_files by module name, so this file has to be importable from sys.path under __name__
+    if "forkserver" not in multiprocessing.get_all_start_methods() or "." in __name__:
+        return worker_pool()
+    spec = importlib.machinery.PathFinder.find_spec(__name__)
+    if spec is None or not spec.origin or os.path.realpath(spec.origin) != os.path.realpath(__file__):
+        return worker_pool()
+    context = multiprocessing.get_context("forkserver")
+    # Preload only this module, so the server does not re-run the host application's __main__
+    context.set_forkserver_preload([__name__])
+    return ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=context)
+
+def find_duplicates(conn, root, min_size=1, job=None):
+    by_size = {}
+    seen_inodes = set()
+    for directory, _, files in os.walk(root):
+        check_cancelled(job)
+        for name in files:
+            path = os.path.join(directory, name)
+            try:
+                stat = os.lstat(path)
+            except OSError:
+                continue
+            if not os.path.isfile(path) or os.path.islink(path) or stat.st_size < min_size:
+                continue
+            if (stat.st_dev, stat.st_ino) in seen_inodes:
+                continue
+            seen_inodes.add((stat.st_dev, stat.st_ino))
+            by_size.setdefault(stat.st_size, []).append((path, stat))
+        if job is not None:
+            job["progress"]["files_scanned"] = len(seen_inodes)
+
+    candidates = [group for group in by_size.values() if len(group) > 1]
+    cached = {}
+    for group in candidates:
+        for path, stat in group:
+            row = conn.execute("SELECT size, mtime_ns, partial, full FROM hashes WHERE dev = ? AND inode = ?",
+                               (stat.st_dev, stat.st_ino)).fetchone()
+            if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+                cached[path] = {"partial": row[2], "full": row[3]}
+            else:
+                cached[path] = {"partial": None, "full": None}
+
+    by_partial = {}
+    for group in candidates:
+        check_cancelled(job)
+        for path, stat in group:
+            entry = cached[path]
+            if entry["partial"] is None:
+                try:
+                    entry["partial"] = partial_hash(path, stat.st_size)
+                except OSError:
+                    continue
+            by_partial.setdefault((stat.st_size, entry["partial"]), []).append((path, stat))
+
+    need_full = []
+    for (size, _), group in by_partial.items():
+        if len(group) > 1 and size > 2 * HASH_EDGE_BYTES:
+            need_full.extend(path for path, _ in group if cached[path]["full"] is None)
+    if need_full:
+        if job is not None:
+            job["progress"].update({"full_hashes_done": 0, "full_hashes_total": len(need_full)})
+        with worker_pool() as pool:
+            for path, digest in pool.map(full_hash, need_full):
+                cached[path]["full"] = digest
+                if job is not None:
+                    job["progress"]["full_hashes_done"] += 1
+                check_cancelled(job)
+
+    groups = {}
+    for (size, partial), group in by_partial.items():
+        if len(group) < 2:
+            continue
+        for path, stat in group:
+            digest = partial if size <= 2 * HASH_EDGE_BYTES else cached[path]["full"]
+            if digest is None:
+                continue
+            groups.setdefault((size, digest), []).append(path)
+            conn.execute("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?)",
+                         (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns, partial, cached[path]["full"]))
+    conn.commit()
+
+    result = [{"size": size, "hash": digest, "files": sorted(paths)}
+              for (size, digest), paths in groups.items() if len(paths) > 1]
+    result.sort(key=lambda g: g["size"] * (len(g["files"]) - 1), reverse=True)
+    return result
+
+USAGE_WORKERS = 8
+USAGE_CACHE = collections.OrderedDict()  # least recently used first
+USAGE_CACHE_LOCK = threading.Lock()
+USAGE_CACHE_MAX_DIRS = 20000
+USAGE_TOP_LIMIT = 100
+
+def forget_usage(paths):
+    """Drop cached entries for directories that no longer exist, and everything cached below them."""
+    stack = list(paths)
+    while stack:
+        entry = USAGE_CACHE.pop(stack.pop(), None)
+        if entry is not None:
+            stack.extend(entry["subdirs"])
+
+def scan_usage_dir(path):
+    """Return (entry, rescanned) for one directory, reusing the cached entry while its mtime is unchanged."""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        mtime = None
+    with USAGE_CACHE_LOCK:
+        cached = USAGE_CACHE.get(path)
+        if cached is not None and mtime is not None and cached["mtime"] == mtime:
+            USAGE_CACHE.move_to_end(path)
+            return cached, False
+
+    entry = {"path": path, "mtime": mtime, "size": 0, "files": 0, "subdirs": [], "largest": []}
+    files = []
+    try:
+        with os.scandir(path) as entries:
+            for item in entries:
+                try:
+                    if item.is_dir(follow_symlinks=False):
+                        entry["subdirs"].append(item.path)
+                    elif item.is_file(follow_symlinks=False):
+                        size = item.stat(follow_symlinks=False).st_size
+                        entry["size"] += size
+                        entry["files"] += 1
+                        files.append((size, item.path))
+                except OSError:
+                    continue
+    except OSError:
+        entry["mtime"] = None
+    entry["largest"] = heapq.nlargest(USAGE_TOP_LIMIT, files)
+    with USAGE_CACHE_LOCK:
+        if cached is not None:
+            forget_usage(set(cached["subdirs"]) - set(entry["subdirs"]))
+        USAGE_CACHE[path] = entry
+        USAGE_CACHE.move_to_end(path)
+        while len(USAGE_CACHE) > USAGE_CACHE_MAX_DIRS:
+            USAGE_CACHE.popitem(last=False)
+    return entry, True
+
+def scan_usage(root, job=None):
+    """Walk root with a thread pool, one scandir task per directory; returns (entries by path, number rescanned)."""
+    entries = {}
+    rescanned = 0
+    visited = 0
+    with ThreadPoolExecutor(max_workers=USAGE_WORKERS) as pool:
+        pending = {pool.submit(scan_usage_dir, root)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                entry, fresh = future.result()
+                entries[entry["path"]] = entry
+                rescanned += fresh
+                visited += 1
+                pending.update(pool.submit(scan_usage_dir, sub) for sub in entry["subdirs"])
+            if job is not None:
+                job["progress"].update({"directories_visited": visited, "directories_rescanned": rescanned})
+            if job is not None and job["cancel"].is_set():
+                for future in pending:
+                    future.cancel()
+                check_cancelled(job)
+    return entries, rescanned
+
+def disk_usage(root, top=10, job=None):
+    # Work from this scan's own entries; the shared cache may evict some of them meanwhile
+    entries, rescanned = scan_usage(root, job)
+
+    order = []
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        order.append(directory)
+        stack.extend(entries[directory]["subdirs"])
+
+    totals = {}
+    for directory in reversed(order):
+        entry = entries[directory]
+        size, files, dirs = entry["size"], entry["files"], len(entry["subdirs"])
+        for sub in entry["subdirs"]:
+            sub_size, sub_files, sub_dirs = totals[sub]
+            size += sub_size
+            files += sub_files
+            dirs += sub_dirs
+        totals[directory] = (size, files, dirs)
+
+    top = max(0, min(top, USAGE_TOP_LIMIT))
+    largest_files = heapq.nlargest(top, (item for directory in order for item in entries[directory]["largest"]))
+    largest_dirs = heapq.nlargest(top, ((totals[d][0], d) for d in order if d != root))
+    size, files, dirs = totals[root]
+    return {
+        "path": root,
+        "size": size,
+        "files": files,
+        "directories": dirs,
+        "largest_files": [{"path": path, "size": file_size} for file_size, path in largest_files],
+        "largest_directories": [{"path": path, "size": dir_size, "files": totals[path][1]} for dir_size, path in largest_dirs],
+        "directories_rescanned": rescanned
+    }
+
+WATCH_POLL_INTERVAL = 2
+WATCH_MAX_DIRS = 8192
+WATCH_MAX_EVENTS = 1000
+WATCHERS = {}
+WATCHERS_LOCK = threading.Lock()
+
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ONLYDIR = 0x1000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR
+
+def load_inotify():
+    if PLATFORM != "linux":
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+def watcher_for(path):
+    with WATCHERS_LOCK:
+        for root, watcher in WATCHERS.items():
+            if path == root or path.startswith(subtree_bounds(root)[0]):
+                return watcher
+    return None
+
+def emit_event(watcher, kind, path):
+    with watcher["changed"]:
+        watcher["seq"] += 1
+        watcher["events"].append({"seq": watcher["seq"], "type": kind, "path": path, "time": time.time()})
+        watcher["changed"].notify_all()
+
+def set_entry(watcher, directory, name, info):
+    """Record info (mtime_ns, size, is_dir) for directory/name, keeping the mtime ordering in step."""
+    entries = watcher["entries"].setdefault(directory, {})
+    order = watcher["order"].setdefault(directory, [])
+    old = entries.get(name)
+    if old == info:
+        return None
+    if old is not None and not old[2]:
+        index = bisect.bisect_left(order, (old[0], name))
+        if index < len(order) and order[index] == (old[0], name):
+            del order[index]
+    entries[name] = info
+    if not info[2]:
+        bisect.insort(order, (info[0], name))
+    return "created" if old is None else "modified"
+
+def drop_entry(watcher, directory, name):
+    entries = watcher["entries"].get(directory, {})
+    old = entries.pop(name, None)
+    if old is None:
+        return False
+    path = os.path.join(directory, name)
+    if old[2]:
+        low, high = subtree_bounds(path)
+        for sub in [d for d in watcher["entries"] if d == path or low <= d < high]:
+            watcher["entries"].pop(sub, None)
+            watcher["order"].pop(sub, None)
+            wd = watcher["dir_wds"].pop(sub, None)
+            if wd is not None:
+                watcher["wds"].pop(wd, None)
+    else:
+        order = watcher["order"].get(directory, [])
+        index = bisect.bisect_left(order, (old[0], name))
+        if index < len(order) and order[index] == (old[0], name):
+            del order[index]
+    return True
+
+def sync_entry(watcher, directory, name, emit=True):
+    path = os.path.join(directory, name)
+    try:
+        stat = os.lstat(path)
+    except OSError:
+        if drop_entry(watcher, directory, name) and emit:
+            emit_event(watcher, "deleted", path)
+        return
+    is_dir = S_ISDIR(stat.st_mode)
+    change = set_entry(watcher, directory, name, (stat.st_mtime_ns, stat.st_size, is_dir))
+    if change and emit:
+        emit_event(watcher, change, path)
+    if is_dir and path not in watcher["entries"]:
+        sync_dir(watcher, path, emit)
+
+def sync_dir(watcher, directory, emit=True):
+    """Rescan directory and its subdirectories, emitting events for anything that changed."""
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        if current not in watcher["entries"] and len(watcher["entries"]) >= WATCH_MAX_DIRS:
+            watcher["truncated"] = True
+            continue
+        seen = {}
+        try:
+            with os.scandir(current) as items:
+                for item in items:
+                    try:
+                        stat = item.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    seen[item.name] = (stat.st_mtime_ns, stat.st_size, S_ISDIR(stat.st_mode))
+        except OSError:
+            pass
+        watcher["entries"].setdefault(current, {})
+        add_watch(watcher, current)
+        for name in list(watcher["entries"][current]):
+            if name not in seen and drop_entry(watcher, current, name) and emit:
+                emit_event(watcher, "deleted", os.path.join(current, name))
+        for name, info in seen.items():
+            change = set_entry(watcher, current, name, info)
+            if change and emit:
+                emit_event(watcher, change, os.path.join(current, name))
+            if info[2]:
+                stack.append(os.path.join(current, name))
+
+def add_watch(watcher, directory):
+    if watcher["fd"] is None or directory in watcher["dir_wds"]:
+        return
+    wd = watcher["libc"].inotify_add_watch(watcher["fd"], os.fsencode(directory), WATCH_MASK)
+    if wd < 0:
+        # Out of inotify watches (or similar): keep serving from memory but poll for changes
+        watcher["backend"] = "polling"
+        return
+    watcher["wds"][wd] = directory
+    watcher["dir_wds"][directory] = wd
+
+def run_inotify(watcher):
+    fd = watcher["fd"]
+    while not watcher["stop"].is_set():
+        if watcher["backend"] == "polling":
+            return run_polling(watcher)
+        ready, _, _ = select.select([fd], [], [], 0.5)
+        if not ready:
+            continue
+        try:
+            data = os.read(fd, 64 * 1024)
+        except BlockingIOError:
+            continue
+        offset = 0
+        with watcher["lock"]:
+            while offset + 16 <= len(data):
+                wd, mask, _, length = struct.unpack_from("iIII", data, offset)
+                name = data[offset + 16:offset + 16 + length].rstrip(b"\0")
+                offset += 16 + length
+                if mask & IN_Q_OVERFLOW:
+                    sync_dir(watcher, watcher["root"])
+                    continue
+                directory = watcher["wds"].get(wd)
+                if directory is None or mask & (IN_IGNORED | IN_DELETE_SELF) or not name:
+                    continue
+                sync_entry(watcher, directory, os.fsdecode(name))
+
+def run_polling(watcher):
+    while not watcher["stop"].wait(WATCH_POLL_INTERVAL):
+        with watcher["lock"]:
+            sync_dir(watcher, watcher["root"])
+
+def start_watch(root):
+    with WATCHERS_LOCK:
+        if root in WATCHERS:
+            return WATCHERS[root]
+    libc = load_inotify()
+    fd = None
+    if libc is not None:
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            fd = None
+    watcher = {
+        "root": root,
+        "backend": "inotify" if fd is not None else "polling",
+        "libc": libc,
+        "fd": fd,
+        "wds": {},
+        "dir_wds": {},
+        "entries": {},
+        "order": {},
+        "events": collections.deque(maxlen=WATCH_MAX_EVENTS),
+        "seq": 0,
+        "truncated": False,
+        "lock": threading.RLock(),
+        "changed": threading.Condition(),
+        "stop": threading.Event()
+    }
+    with watcher["lock"]:
+        sync_dir(watcher, root, emit=False)
+    target = run_inotify if watcher["backend"] == "inotify" else run_polling
+    watcher["thread"] = threading.Thread(target=target, args=(watcher,), name=f"file_ops-watch:{root}", daemon=True)
+    watcher["thread"].start()
+    with WATCHERS_LOCK:
+        WATCHERS[root] = watcher
+    return watcher
+
+def stop_watch(root):
+    with WATCHERS_LOCK:
+        watcher = WATCHERS.pop(root, None)
+    if watcher is None:
+        return False
+    watcher["stop"].set()
+    watcher["thread"].join(timeout=5)
+    if watcher["fd"] is not None:
+        os.close(watcher["fd"])
+    return True
+
+def watched_latest(watcher, directory):
+    with watcher["lock"]:
+        order = watcher["order"].get(directory)
+        entries = watcher["entries"].get(directory, {})
+        for _, name in reversed(order or []):
+            if not entries[name][2] and not os.path.islink(os.path.join(directory, name)):
+                return os.path.join(directory, name)
+    return None
+
+def watched_listing(watcher, directory):
+    with watcher["lock"]:
+        entries = watcher["entries"].get(directory)
+        if entries is None:
+            return None
+        return [{"name": name, "type": "directory" if info[2] else "file", "path": os.path.join(directory, name)}
+                for name, info in entries.items()]
+
+def watched_search(watcher, root, pattern):
+    include_hidden = pattern.startswith('.')
+    low = subtree_bounds(root)[0]
+    matches = []
+    with watcher["lock"]:
+        for directory, entries in watcher["entries"].items():
+            if directory != root and not directory.startswith(low):
+                continue
+            relative = directory[len(low):] if directory != root else ""
+            if not include_hidden and any(part.startswith('.') for part in relative.split(os.sep) if part):
+                continue
+            for name, info in entries.items():
+                if fnmatch.fnmatchcase(name, pattern) and (include_hidden or not name.startswith('.')):
+                    matches.append({"path": os.path.join(directory, name), "name": name, "is_directory": info[2]})
+    return matches
+
+def watched_events(watcher, since, wait=0):
+    with watcher["changed"]:
+        if wait and watcher["seq"] <= since:
+            watcher["changed"].wait_for(lambda: watcher["seq"] > since or watcher["stop"].is_set(), timeout=wait)
+        events = [event for event in watcher["events"] if event["seq"] > since]
+        return {"events": events, "next_since": watcher["seq"]}
+
+GREP_BATCH = 64
+GREP_MAX_RESULTS = 200
+GREP_MAX_LINE = 500
+
+def parse_ignore_file(path):
+    base = os.path.dirname(path)
+    rules = []
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return rules
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        rules.append(ignore_rule(line, base))
+    return rules
+
+def ignore_rule(line, base):
+    """Turn one .gitignore-style line into (base, pattern, anchored, dir_only, negated)."""
+    negated = line.startswith('!')
+    if negated:
+        line = line[1:]
+    dir_only = line.endswith('/')
+    line = line.rstrip('/')
+    anchored = '/' in line
+    return base, line.lstrip('/'), anchored, dir_only, negated
+
+def is_ignored(path, is_dir, rules):
+    ignored = False
+    for base, pattern, anchored, dir_only, negated in rules:
+        if dir_only and not is_dir:
+            continue
+        if base and not path.startswith(subtree_bounds(base)[0]):
+            continue
+        if anchored:
+            target = os.path.relpath(path, base).replace(os.sep, '/') if base else path.replace(os.sep, '/')
+            matched = fnmatch.fnmatchcase(target, pattern) or fnmatch.fnmatchcase(target, pattern.replace('**/', ''))
+        else:
+            matched = fnmatch.fnmatchcase(os.path.basename(path), pattern)
+        if matched:
+            ignored = not negated
+    return ignored
+
+def grep_candidates(root, name_pattern, excludes, job=None):
+    """Yield files under root matching name_pattern, honouring .gitignore files and extra excludes."""
+    # Excludes are relative to root, like a .gitignore at its top
+    rules = [ignore_rule(line, root) for line in excludes]
+    inherited = {root: rules}
+    for directory, dirs, files in os.walk(root):
+        check_cancelled(job)
+        rules = inherited.pop(directory, rules)
+        if '.gitignore' in files:
+            rules = rules + parse_ignore_file(os.path.join(directory, '.gitignore'))
+        kept = []
+        for name in dirs:
+            path = os.path.join(directory, name)
+            if name != '.git' and not is_ignored(path, True, rules):
+                kept.append(name)
+                inherited[path] = rules
+        dirs[:] = sorted(kept)
+        for name in sorted(files):
+            path = os.path.join(directory, name)
+            if fnmatch.fnmatchcase(name, name_pattern) and not is_ignored(path, False, rules):
+                yield path
+
+def grep_files(paths, query, use_regex, ignore_case, limit):
+    # Matches are reported per line, so ^ and $ anchor at line boundaries
+    regex = re.compile(query.encode('utf-8') if use_regex else re.escape(query.encode('utf-8')),
+                       re.MULTILINE | (re.IGNORECASE if ignore_case else 0))
+    matches = []
+    scanned = 0
+    for path in paths:
+        if len(matches) >= limit:
+            break
+        try:
+            with open(path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0 or looks_binary(f.read(READ_SNIFF_BYTES)):
+                    continue
+                scanned += 1
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    line_number = 1
+                    counted_to = 0
+                    position = 0
+                    while len(matches) < limit:
+                        found = regex.search(mm, position)
+                        if found is None:
+                            break
+                        start = mm.rfind(b"\n", 0, found.start()) + 1
+                        end = mm.find(b"\n", found.start())
+                        if end < 0:
+                            end = len(mm)
+                        line_number += mm[counted_to:start].count(b"\n")
+                        counted_to = start
+                        text = mm[start:end].decode('utf-8', errors='replace').rstrip("\r")
+                        matches.append({"path": path, "line": line_number, "text": text[:GREP_MAX_LINE]})
+                        position = end + 1
+                        if position > len(mm):
+                            break
+        except (OSError, ValueError):
+            continue
+    return matches, scanned
+
+def grep_tree(root, query, use_regex=False, ignore_case=False, name_pattern="*", excludes=(),
+              max_results=GREP_MAX_RESULTS, job=None):
+    matches = []
+    scanned = 0
+    truncated = False
+    if job is not None:
+        job["partial"] = matches
+    with grep_pool() as pool:
+        pending = set()
+        candidates = grep_candidates(root, name_pattern, list(excludes), job)
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < USAGE_WORKERS * 2:
+                batch = [path for _, path in zip(range(GREP_BATCH), candidates)]
+                if not batch:
+                    exhausted = True
+                    break
+                pending.add(pool.submit(grep_files, batch, query, use_regex, ignore_case, max_results - len(matches)))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                found, count = future.result()
+                scanned += count
+                matches.extend(found[:max_results - len(matches)])
+            if job is not None:
+                job["progress"].update({"files_scanned": scanned, "matches": len(matches)})
+            if len(matches) >= max_results or (job is not None and job["cancel"].is_set()):
+                truncated = len(matches) >= max_results
+                for future in pending:
+                    future.cancel()
+                check_cancelled(job)
+                break
+    return {"matches": matches, "files_scanned": scanned, "truncated": truncated}
+
+TREE_MAX_ENTRIES = 1000
+
+def build_tree(root, max_depth=3, max_entries=TREE_MAX_ENTRIES, cursor=None):
+    """Walk root in sorted pre-order, emitting at most max_entries entries.
+
+    The cursor is the relative path of the last entry emitted by the previous
+    page; resuming only rescans the directories along that path.
+    """
+    state = {"emitted": 0, "last": None, "full": False}
+
+    def visit(path, rel, depth, resume):
+        node = {"name": os.path.basename(path) or path, "type": "directory", "children": []}
+        try:
+            with os.scandir(path) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except PermissionError:
+            node["children"].append({"name": "Permission denied", "type": "error"})
+            return node
+        except OSError as e:
+            node["children"].append({"name": str(e), "type": "error"})
+            return node
+
+        node["child_count"] = len(entries)
+        if depth > max_depth:
+            if entries:
+                node["children"].append({"name": "...", "type": "more"})
+            return node
+
+        for entry in entries:
+            entry_rel = f"{rel}/{entry.name}" if rel else entry.name
+            already_emitted = False
+            if resume:
+                if entry.name < resume[0]:
+                    continue
+                if entry.name == resume[0]:
+                    already_emitted = True
+
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+
+            if already_emitted:
+                if is_dir:
+                    child = visit(entry.path, entry_rel, depth + 1, resume[1:])
+                    child["continued"] = True
+                    node["children"].append(child)
+                resume = None
+                if state["full"]:
+                    break
+                continue
+            resume = None
+
+            if state["emitted"] >= max_entries:
+                state["full"] = True
+                break
+            state["emitted"] += 1
+            state["last"] = entry_rel
+
+            if is_dir:
+                node["children"].append(visit(entry.path, entry_rel, depth + 1, None))
+            else:
+                node["children"].append({"name": entry.name, "type": "file"})
+            if state["full"]:
+                break
+        return node
+
+    resume = cursor.split("/") if cursor else None
+    tree = visit(root, "", 0, resume)
+    return tree, state["last"] if state["full"] else None, state["emitted"]
+
+def search_index(conn, root, pattern):
+    low, high = subtree_bounds(root)
+    include_hidden = pattern.startswith('.')
+    matches = []
+    rows = conn.execute(
+        "SELECT path, name, is_dir FROM files WHERE path >= ? AND path < ? AND name GLOB ?",
+        (low, high, pattern.replace("[!", "[^")))
+    for path, name, is_dir in rows:
+        # glob() skips dotfiles and dot-directories unless asked for them explicitly
+        if not include_hidden and any(part.startswith('.') for part in path[len(low):].split(os.sep)):
+            continue
+        # A file removed without touching its directory's mtime (e.g. within the same timestamp tick)
+        if not os.path.lexists(path):
+            continue
+        matches.append({
+            "path": path,
+            "name": name,
+            "is_directory": bool(is_dir)
+        })
+    return matches
+
+def glob_search(root, pattern):
+    """Search with glob for patterns that span directories, which the name-only index cannot match."""
+    matches = []
+    for item in glob.glob(os.path.join(root, "**", pattern), recursive=True):
+        if os.path.exists(item):
+            matches.append({"path": item, "name": os.path.basename(item), "is_directory": os.path.isdir(item)})
+    return matches
+
+def resolve_path(path):
+    if path.startswith('~'):
+        path = os.path.join(os.path.expanduser('~'), path[2:] if path.startswith('~/') or path.startswith('~\\') else path[1:])
+    return os.path.normpath(path)
+
+def describe_file(path, stat):
+    return {
+        "name": os.path.basename(path),
+        "path": path,
+        "size": stat.st_size,
+        "created": datetime.datetime.fromtimestamp(stat.st_ctime).isoformat(),
+        "modified": datetime.datetime.fromtimestamp(stat.st_mtime).isoformat(),
+        "accessed": datetime.datetime.fromtimestamp(stat.st_atime).isoformat(),
+        "is_directory": S_ISDIR(stat.st_mode),
+        "is_file": S_ISREG(stat.st_mode),
+        "permissions": oct(stat.st_mode)[-3:]
+    }
+
+def run_operation(args, job=None):
     try:
         operation = args.get("operation")
         source = args.get("source", "")
@@ -19,98 +1157,142 @@ async def function(args):
         pattern = args.get("pattern", "*")
 
         if source:
-            if source.startswith('~'):
-                source = os.path.join(os.path.expanduser('~'), source[2:] if source.startswith('~/') or source.startswith('~\\') else source[1:])
-            source = os.path.normpath(source)
+            source = resolve_path(source)
             
         if destination:
-            if destination.startswith('~'):
-                destination = os.path.join(os.path.expanduser('~'), destination[2:] if destination.startswith('~/') or destination.startswith('~\\') else destination[1:])
-            destination = os.path.normpath(destination)
+            destination = resolve_path(destination)
         
         # Operation-specific validations
-        if operation in ["move", "copy", "latest", "read", "file_info", "search"]:
+        if operation in ["move", "copy", "latest", "read", "file_info", "disk_usage", "search", "grep", "reindex", "find_duplicates"]:
             if not source or not os.path.exists(source):
-                return json.dumps({"error": f"Source not found: {source}"})
+                return {"error": f"Source not found: {source}"}
                 
         if operation in ["move", "copy", "write", "create_directory"]:
             if not destination:
-                return json.dumps({"error": f"Destination required for {operation}"})
+                return {"error": f"Destination required for {operation}"}
             
             # Create parent directories if they don't exist for certain operations
             if operation in ["write", "create_directory"]:
                 os.makedirs(os.path.dirname(destination), exist_ok=True)
                 
+        patterns = args.get("patterns")
+        if isinstance(patterns, str):
+            patterns = [patterns]
+
         # Handle different operations
-        if operation == "move":
+        if operation in ["move", "copy"] and patterns:
+            try:
+                if not os.path.isdir(source):
+                    return {"error": f"Not a directory: {source}"}
+                workers = int(args.get("workers", COPY_WORKERS))
+                result = bulk_transfer(operation, source, destination, patterns, workers, job)
+                return result
+            except OperationCancelled:
+                raise
+            except Exception as e:
+                return {"error": f"Bulk {operation} failed: {str(e)}"}
+
+        elif operation == "move":
             if filename:
                 matches = list(Path(source).glob(f"{filename}*"))
                 if not matches:
-                    return json.dumps({"error": f"No file matching '{filename}' found"})
+                    return {"error": f"No file matching '{filename}' found"}
                 
                 src_file = matches[0]
                 dst_file = Path(destination) / src_file.name
                 
                 try:
                     if not src_file.is_file():
-                        return json.dumps({"error": "Source is not a file"})
+                        return {"error": "Source is not a file"}
                     
                     dst_file.parent.mkdir(parents=True, exist_ok=True)
                     
                     os.replace(str(src_file), str(dst_file))
                     
                     if not dst_file.exists():
-                        return json.dumps({"error": "Move operation failed"})
+                        return {"error": "Move operation failed"}
                         
                 except PermissionError:
-                    return json.dumps({"error": "Permission denied"})
+                    return {"error": "Permission denied"}
                 except Exception as e:
-                    return json.dumps({"error": f"Move failed: {str(e)}"})
+                    return {"error": f"Move failed: {str(e)}"}
             else:
-                return json.dumps({"error": "Filename required for move operation"})
+                return {"error": "Filename required for move operation"}
 
         elif operation == "latest":
             try:
-                files = [(f, os.path.getmtime(f)) for f in Path(source).iterdir() if f.is_file()]
-                if not files:
-                    return json.dumps({"error": f"No files found in {source}"})
-                
-                latest = max(files, key=lambda x: x[1])[0]
+                watcher = watcher_for(source)
+                if watcher is not None and source in watcher["entries"]:
+                    latest = watched_latest(watcher, source)
+                    if latest is None:
+                        return {"error": f"No files found in {source}"}
+                    latest = Path(latest)
+                else:
+                    files = [(f, os.path.getmtime(f)) for f in Path(source).iterdir() if f.is_file()]
+                    if not files:
+                        return {"error": f"No files found in {source}"}
+                    
+                    latest = max(files, key=lambda x: x[1])[0]
                 dst_file = Path(destination) / latest.name
                 
                 os.replace(str(latest), str(dst_file))
                 
                 if not dst_file.exists():
-                    return json.dumps({"error": "Move operation failed"})
+                    return {"error": "Move operation failed"}
                     
             except Exception as e:
-                return json.dumps({"error": f"Latest operation failed: {str(e)}"})
+                return {"error": f"Latest operation failed: {str(e)}"}
                 
         elif operation == "read":
             try:
                 if os.path.isdir(source):
-                    return json.dumps({"error": f"Cannot read a directory: {source}"})
+                    return {"error": f"Cannot read a directory: {source}"}
+                
+                with open(source, 'rb') as f:
+                    prefix = f.read(READ_SNIFF_BYTES)
+                if looks_binary(prefix):
+                    return {"error": "File appears to be binary and cannot be read as text"}
+                
+                if args.get("head"):
+                    return read_head(source, int(args["head"]))
+                if args.get("tail"):
+                    return read_tail(source, int(args["tail"]))
                 
-                with open(source, 'r', encoding='utf-8', errors='replace') as f:
-                    content = f.read()
-                return json.dumps({"content": content})
+                offset = int(args.get("offset", 0))
+                length = args.get("length")
+                if offset < 0:
+                    return {"error": "Offset must not be negative"}
+                if length is not None and int(length) <= 0:
+                    return {"error": "Length must be positive"}
+                if length is None and offset == 0 and os.path.getsize(source) <= READ_MAX_BYTES:
+                    with open(source, 'r', encoding='utf-8', errors='replace') as f:
+                        content = f.read()
+                    return {"content": content}
+                
+                return read_range(source, offset, int(length) if length is not None else READ_MAX_BYTES)
             except UnicodeDecodeError:
-                return json.dumps({"error": "File appears to be binary and cannot be read as text"})
+                return {"error": "File appears to be binary and cannot be read as text"}
             except Exception as e:
-                return json.dumps({"error": f"Read failed: {str(e)}"})
+                return {"error": f"Read failed: {str(e)}"}
                 
         elif operation == "write":
             try:
                 with open(destination, 'w', encoding='utf-8') as f:
                     f.write(content)
-                return json.dumps({"message": f"Successfully wrote to {destination}"})
+                return {"message": f"Successfully wrote to {destination}"}
             except Exception as e:
-                return json.dumps({"error": f"Write failed: {str(e)}"})
+                return {"error": f"Write failed: {str(e)}"}
                 
         elif operation == "list_directory":
             try:
                 if not os.path.isdir(source):
-                    return json.dumps({"error": f"Not a directory: {source}"})
+                    return {"error": f"Not a directory: {source}"}
+                
+                watcher = watcher_for(source)
+                if watcher is not None:
+                    items = watched_listing(watcher, source)
+                    if items is not None:
+                        return {"items": items}
                 
                 items = []
                 for item in os.listdir(source):
@@ -122,91 +1304,173 @@ async def function(args):
                         "path": full_path
                     })
                 
-                return json.dumps({"items": items})
+                return {"items": items}
             except Exception as e:
-                return json.dumps({"error": f"List directory failed: {str(e)}"})
+                return {"error": f"List directory failed: {str(e)}"}
                 
         elif operation == "directory_tree":
             try:
                 if not os.path.isdir(source):
-                    return json.dumps({"error": f"Not a directory: {source}"})
-                
-                def build_tree(path, max_depth=3, current_depth=0):
-                    if current_depth > max_depth:
-                        return {"name": os.path.basename(path), "type": "directory", "children": [{"name": "...", "type": "more"}]}
-                    
-                    result = {"name": os.path.basename(path), "type": "directory", "children": []}
-                    
-                    try:
-                        for item in os.listdir(path):
-                            full_path = os.path.join(path, item)
-                            if os.path.isdir(full_path):
-                                result["children"].append(build_tree(full_path, max_depth, current_depth + 1))
-                            else:
-                                result["children"].append({"name": item, "type": "file"})
-                    except PermissionError:
-                        result["children"].append({"name": "Permission denied", "type": "error"})
-                    
-                    return result
+                    return {"error": f"Not a directory: {source}"}
                 
-                tree = build_tree(source)
-                return json.dumps({"tree": tree})
+                max_depth = int(args.get("max_depth", 3))
+                max_entries = int(args.get("max_entries", TREE_MAX_ENTRIES))
+                tree, next_cursor, emitted = build_tree(source, max_depth, max_entries, args.get("cursor"))
+                return {"tree": tree, "entries": emitted, "next_cursor": next_cursor}
             except Exception as e:
-                return json.dumps({"error": f"Directory tree failed: {str(e)}"})
+                return {"error": f"Directory tree failed: {str(e)}"}
                 
         elif operation == "file_info":
             try:
                 if not os.path.exists(source):
-                    return json.dumps({"error": f"File not found: {source}"})
-                
-                stat = os.stat(source)
-                info = {
-                    "name": os.path.basename(source),
-                    "path": source,
-                    "size": stat.st_size,
-                    "created": datetime.datetime.fromtimestamp(stat.st_ctime).isoformat(),
-                    "modified": datetime.datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                    "accessed": datetime.datetime.fromtimestamp(stat.st_atime).isoformat(),
-                    "is_directory": os.path.isdir(source),
-                    "is_file": os.path.isfile(source),
-                    "permissions": oct(stat.st_mode)[-3:]
-                }
+                    return {"error": f"File not found: {source}"}
                 
-                return json.dumps({"info": info})
+                return {"info": describe_file(source, os.stat(source))}
             except Exception as e:
-                return json.dumps({"error": f"File info failed: {str(e)}"})
+                return {"error": f"File info failed: {str(e)}"}
+                
+        elif operation == "disk_usage":
+            try:
+                if not os.path.isdir(source):
+                    return {"error": f"Not a directory: {source}"}
+                
+                return disk_usage(source, int(args.get("top", 10)), job)
+            except OperationCancelled:
+                raise
+            except Exception as e:
+                return {"error": f"Disk usage failed: {str(e)}"}
                 
         elif operation == "search":
             try:
                 if not os.path.isdir(source):
-                    return json.dumps({"error": f"Not a directory: {source}"})
-                
-                matches = []
-                for item in glob.glob(f"{source}/**/{pattern}", recursive=True):
-                    if os.path.exists(item):  # Check in case it was deleted during search
-                        matches.append({
-                            "path": item,
-                            "name": os.path.basename(item),
-                            "is_directory": os.path.isdir(item)
-                        })
-                
-                return json.dumps({"matches": matches})
+                    return {"error": f"Not a directory: {source}"}
+                
+                if "/" in pattern or os.sep in pattern:
+                    return {"matches": glob_search(source, pattern)}
+                
+                watcher = watcher_for(source)
+                if watcher is not None and not watcher["truncated"]:
+                    return {"matches": watched_search(watcher, source, pattern)}
+                
+                conn = open_index()
+                try:
+                    # Every search re-checks directory mtimes, so only changed directories are rescanned
+                    refresh_index(conn, source, job=job)
+                    matches = search_index(conn, source, pattern)
+                finally:
+                    conn.close()
+                
+                return {"matches": matches}
+            except OperationCancelled:
+                raise
+            except Exception as e:
+                return {"error": f"Search failed: {str(e)}"}
+                
+        elif operation == "grep":
+            try:
+                if not os.path.isdir(source):
+                    return {"error": f"Not a directory: {source}"}
+                query = args.get("query", "")
+                if not query:
+                    return {"error": "Query required for grep"}
+                if args.get("regex", False):
+                    re.compile(query)
+                
+                excludes = args.get("excludes", [])
+                if isinstance(excludes, str):
+                    excludes = [excludes]
+                return grep_tree(source, query, args.get("regex", False), args.get("ignore_case", False), pattern,
+                                 excludes, int(args.get("max_results", GREP_MAX_RESULTS)), job)
+            except OperationCancelled:
+                raise
+            except re.error as e:
+                return {"error": f"Invalid regular expression: {str(e)}"}
+            except Exception as e:
+                return {"error": f"Grep failed: {str(e)}"}
+                
+        elif operation == "watch":
+            try:
+                if not os.path.isdir(source):
+                    return {"error": f"Not a directory: {source}"}
+                
+                watcher = start_watch(source)
+                return {
+                    "message": f"Watching {source}",
+                    "backend": watcher["backend"],
+                    "directories": len(watcher["entries"]),
+                    "since": watcher["seq"]
+                }
+            except Exception as e:
+                return {"error": f"Watch failed: {str(e)}"}
+                
+        elif operation == "unwatch":
+            if stop_watch(source):
+                return {"message": f"Stopped watching {source}"}
+            return {"error": f"Not watching {source}"}
+                
+        elif operation == "watch_events":
+            watcher = watcher_for(source)
+            if watcher is None:
+                return {"error": f"Not watching {source}"}
+            result = watched_events(watcher, int(args.get("since", 0)), float(args.get("wait", 0)))
+            if source != watcher["root"]:
+                low = subtree_bounds(source)[0]
+                result["events"] = [e for e in result["events"] if e["path"] == source or e["path"].startswith(low)]
+            return result
+                
+        elif operation == "find_duplicates":
+            try:
+                if not os.path.isdir(source):
+                    return {"error": f"Not a directory: {source}"}
+                
+                conn = open_index()
+                try:
+                    groups = find_duplicates(conn, source, int(args.get("min_size", 1)), job)
+                finally:
+                    conn.close()
+                
+                return {
+                    "groups": groups,
+                    "duplicate_files": sum(len(g["files"]) - 1 for g in groups),
+                    "wasted_bytes": sum(g["size"] * (len(g["files"]) - 1) for g in groups)
+                }
+            except OperationCancelled:
+                raise
+            except Exception as e:
+                return {"error": f"Find duplicates failed: {str(e)}"}
+                
+        elif operation == "reindex":
+            try:
+                if not os.path.isdir(source):
+                    return {"error": f"Not a directory: {source}"}
+                
+                conn = open_index()
+                try:
+                    scanned = refresh_index(conn, source, force=args.get("full", False), job=job)
+                    low, high = subtree_bounds(source)
+                    count = conn.execute("SELECT COUNT(*) FROM files WHERE path >= ? AND path < ?", (low, high)).fetchone()[0]
+                finally:
+                    conn.close()
+                
+                return {"message": f"Indexed {count} entries under {source}", "directories_scanned": scanned}
+            except OperationCancelled:
+                raise
             except Exception as e:
-                return json.dumps({"error": f"Search failed: {str(e)}"})
+                return {"error": f"Reindex failed: {str(e)}"}
                 
         elif operation == "create_directory":
             try:
                 os.makedirs(destination, exist_ok=True)
-                return json.dumps({"message": f"Successfully created directory: {destination}"})
+                return {"message": f"Successfully created directory: {destination}"}
             except Exception as e:
-                return json.dumps({"error": f"Create directory failed: {str(e)}"})
+                return {"error": f"Create directory failed: {str(e)}"}
                 
         elif operation == "copy":
             try:
                 if filename:
                     matches = list(Path(source).glob(f"{filename}*"))
                     if not matches:
-                        return json.dumps({"error": f"No file matching '{filename}' found"})
+                        return {"error": f"No file matching '{filename}' found"}
                     
                     src_file = matches[0]
                     dst_file = Path(destination) / src_file.name
@@ -216,16 +1480,128 @@ async def function(args):
                     else:
                         shutil.copy2(src_file, dst_file)
                     
-                    return json.dumps({"message": f"Successfully copied {src_file} to {dst_file}"})
+                    return {"message": f"Successfully copied {src_file} to {dst_file}"}
                 else:
-                    return json.dumps({"error": "Filename required for copy operation"})
+                    return {"error": "Filename required for copy operation"}
             except Exception as e:
-                return json.dumps({"error": f"Copy failed: {str(e)}"})
+                return {"error": f"Copy failed: {str(e)}"}
         else:
-            return json.dumps({"error": "Invalid operation"})
+            return {"error": "Invalid operation"}
 
-        return json.dumps({"message": "File operation completed successfully"})
+        return {"message": "File operation completed successfully"}
         
+    except OperationCancelled:
+        raise
+    except Exception as e:
+        return {"error": str(e)}
+
+def run_job(args, job):
+    try:
+        if args.get("operation") == "batch":
+            job["result"] = run_batch(args, job)
+        else:
+            job["result"] = run_operation(args, job)
+        job["status"] = "completed"
+    except OperationCancelled:
+        job["result"] = {"error": "Operation cancelled", "job_id": job["id"]}
+        job["status"] = "cancelled"
+    except Exception as e:
+        job["result"] = {"error": str(e)}
+        job["status"] = "failed"
+    return job["result"]
+
+BATCH_WORKERS = 8
+BATCH_CONTROL_KEYS = {"operation", "operations", "parallel", "background", "timeout"}
+# Operations that change the tree; a batch containing any of them stats each file_info when it runs
+MUTATING_OPERATIONS = {"move", "copy", "write", "create_directory"}
+
+def prefetch_stats(paths):
+    """Stat paths with one scandir pass per parent directory that holds two or more of them."""
+    by_parent = {}
+    for path in paths:
+        by_parent.setdefault(os.path.dirname(path), set()).add(os.path.basename(path))
+    infos = {}
+    for parent, names in by_parent.items():
+        if len(names) < 2:
+            continue
+        try:
+            with os.scandir(parent) as entries:
+                for entry in entries:
+                    if entry.name in names:
+                        try:
+                            infos[entry.path] = describe_file(entry.path, entry.stat())
+                        except OSError:
+                            pass
+        except OSError:
+            continue
+    return infos
+
+def run_batch(args, job=None):
+    """Run every entry of args["operations"], with the remaining top-level args as shared defaults."""
+    shared = {key: value for key, value in args.items() if key not in BATCH_CONTROL_KEYS}
+    items = [{**shared, **item} for item in args.get("operations", [])]
+    prefetched = {}
+    if not any(item.get("operation") in MUTATING_OPERATIONS for item in items):
+        prefetched = prefetch_stats([resolve_path(item["source"]) for item in items
+                                     if item.get("operation") == "file_info" and item.get("source")])
+    if job is not None:
+        job["progress"].update({"operations_done": 0, "operations_total": len(items)})
+
+    def run_item(item):
+        check_cancelled(job)
+        if item.get("operation") == "batch":
+            result = {"error": "Nested batches are not supported"}
+        elif item.get("operation") == "file_info" and resolve_path(item.get("source", "")) in prefetched:
+            result = {"info": prefetched[resolve_path(item["source"])]}
+        else:
+            result = run_operation(item, job)
+        if job is not None:
+            job["progress"]["operations_done"] += 1
+        return result
+
+    if args.get("parallel", False):
+        with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as pool:
+            results = list(pool.map(run_item, items))
+    else:
+        results = [run_item(item) for item in items]
+
+    failed = sum(1 for result in results if "error" in result)
+    return {
+        "message": f"Completed {len(results) - failed} of {len(results)} operations",
+        "results": [{"index": i, "operation": item.get("operation"), "result": result}
+                    for i, (item, result) in enumerate(zip(items, results))]
+    }
+
+async def function(args):
+    try:
+        operation = args.get("operation")
+        
+        if operation in ["job_status", "cancel_job"]:
+            job = JOBS.get(args.get("job_id", ""))
+            if not job:
+                return json.dumps({"error": f"Unknown job: {args.get('job_id', '')}"})
+            if operation == "cancel_job" and job["status"] == "running":
+                job["cancel"].set()
+            return json.dumps(job_summary(job))
+        
+        job = new_job(operation)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(OPERATION_EXECUTOR, run_job, args, job)
+        
+        if args.get("background", False):
+            return json.dumps({"message": f"Started {operation}", "job_id": job["id"]})
+        
+        timeout = float(args.get("timeout", OPERATION_TIMEOUT))
+        try:
+            return json.dumps(await asyncio.wait_for(future, timeout))
+        except asyncio.TimeoutError:
+            job["cancel"].set()
+            return json.dumps({"error": f"Operation timed out after {timeout:g} seconds", "job_id": job["id"]})
+        except asyncio.CancelledError:
+            job["cancel"].set()
+            raise
+    except asyncio.CancelledError:
+        raise
     except Exception as e:
         return json.dumps({"error": str(e)})
 
@@ -243,20 +1619,56 @@ Examples:
 "read my notes.txt file"
 → {"operation": "read", "source": "~/notes.txt"}
 
+"show the last 50 lines of server.log"
+→ {"operation": "read", "source": "~/logs/server.log", "tail": 50}
+
 "list files in Downloads folder"
 → {"operation": "list_directory", "source": "~/Downloads"}
 
 "get info about my resume.pdf"
 → {"operation": "file_info", "source": "~/Documents/resume.pdf"}
 
+"what is taking up space in my home folder"
+→ {"operation": "disk_usage", "source": "~", "top": 10}
+
 "search for python files in my projects folder"
-→ {"operation": "search", "source": "~/Projects", "pattern": "*.py"}""",
+→ {"operation": "search", "source": "~/Projects", "pattern": "*.py"}
+
+"copy all photos and videos from Camera to Backup"
+→ {"operation": "copy", "source": "~/Camera", "destination": "~/Backup", "patterns": ["**/*.jpg", "**/*.mp4"]}
+
+"find TODO comments in my python projects"
+→ {"operation": "grep", "source": "~/Projects", "query": "TODO", "pattern": "*.py"}
+
+"list the test functions defined in my project"
+→ {"operation": "grep", "source": "~/Projects/app", "query": "^def test_", "regex": true, "pattern": "*.py"}
+
+"keep an eye on my Downloads folder"
+→ {"operation": "watch", "source": "~/Downloads"}
+
+"what changed in Downloads since last time"
+→ {"operation": "watch_events", "source": "~/Downloads", "since": 12}
+
+"find duplicate files in Downloads"
+→ {"operation": "find_duplicates", "source": "~/Downloads"}
+
+"get info about these three files"
+→ {"operation": "batch", "parallel": true, "operations": [{"operation": "file_info", "source": "~/a.pdf"}, {"operation": "file_info", "source": "~/b.pdf"}, {"operation": "file_info", "source": "~/c.pdf"}]}
+
+"back up my photos in the background"
+→ {"operation": "copy", "source": "~/Pictures", "destination": "~/Backup", "patterns": ["**/*.jpg"], "background": true}
+
+"how is that backup going"
+→ {"operation": "job_status", "job_id": "3f2a9c81d0b4"}
+
+"rebuild the file index for my home folder"
+→ {"operation": "reindex", "source": "~", "full": true}""",
     "parameters": {
         "type": "object",
         "properties": {
             "operation": {
                 "type": "string",
-                "enum": ["move", "latest", "read", "write", "list_directory", "directory_tree", "file_info", "search", "create_directory", "copy"],
+                "enum": ["move", "latest", "read", "write", "list_directory", "directory_tree", "file_info", "disk_usage", "search", "grep", "create_directory", "copy", "reindex", "find_duplicates", "watch", "unwatch", "watch_events", "job_status", "cancel_job", "batch"],
                 "description": "Type of file operation"
             },
             "source": {
@@ -277,7 +1689,106 @@ Examples:
             },
             "pattern": {
                 "type": "string",
-                "description": "Search pattern (e.g., *.txt for text files)"
+                "description": "Search pattern (e.g., *.txt for text files); for grep, limits which file names are scanned"
+            },
+            "offset": {
+                "type": "integer",
+                "description": "For read: byte offset to start reading from (use next_offset to page)"
+            },
+            "length": {
+                "type": "integer",
+                "description": "For read: maximum number of bytes to return (default: 1 MB for large files)"
+            },
+            "head": {
+                "type": "integer",
+                "description": "For read: return only the first N lines"
+            },
+            "tail": {
+                "type": "integer",
+                "description": "For read: return only the last N lines"
+            },
+            "patterns": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "For copy/move: glob patterns relative to source to transfer in bulk (e.g., ['*.pdf', 'photos/**'])"
+            },
+            "workers": {
+                "type": "integer",
+                "description": "For bulk copy/move: number of files transferred concurrently"
+            },
+            "max_depth": {
+                "type": "integer",
+                "description": "For directory_tree: deepest level to expand (default: 3)"
+            },
+            "max_entries": {
+                "type": "integer",
+                "description": "For directory_tree: maximum entries per page (default: 1000)"
+            },
+            "cursor": {
+                "type": "string",
+                "description": "For directory_tree: next_cursor from the previous page"
+            },
+            "operations": {
+                "type": "array",
+                "items": {"type": "object"},
+                "description": "For batch: list of operation objects; other top-level fields are used as defaults for each"
+            },
+            "parallel": {
+                "type": "boolean",
+                "description": "For batch: run the operations concurrently instead of in order"
+            },
+            "background": {
+                "type": "boolean",
+                "description": "Run the operation in the background and return a job_id immediately"
+            },
+            "timeout": {
+                "type": "number",
+                "description": "Seconds to wait before cancelling the operation (default: 300)"
+            },
+            "job_id": {
+                "type": "string",
+                "description": "For job_status/cancel_job: id returned by a background or timed-out operation"
+            },
+            "top": {
+                "type": "integer",
+                "description": "For disk_usage: number of largest files and directories to report (default: 10)"
+            },
+            "since": {
+                "type": "integer",
+                "description": "For watch_events: return only events after this sequence number (use next_since from the previous call)"
+            },
+            "wait": {
+                "type": "number",
+                "description": "For watch_events: seconds to wait for new events when there are none yet"
+            },
+            "min_size": {
+                "type": "integer",
+                "description": "For find_duplicates: ignore files smaller than this many bytes (default: 1)"
+            },
+            "query": {
+                "type": "string",
+                "description": "For grep: text (or regular expression with regex=true) to search for inside files"
+            },
+            "regex": {
+                "type": "boolean",
+                "description": "For grep: treat query as a regular expression"
+            },
+            "ignore_case": {
+                "type": "boolean",
+                "description": "For grep: match case-insensitively"
+            },
+            "excludes": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "For grep: extra .gitignore-style patterns to skip (e.g., ['node_modules/', '*.min.js'])"
+            },
+            "max_results": {
+                "type": "integer",
+                "description": "For grep: stop after this many matching lines (default: 200)"
+            },
+            "full": {
+                "type": "boolean",
+                "description": "For reindex: rescan every directory instead of only those whose mtime changed"
             }
         },
         "required": ["operation"]